@@ -52,6 +52,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "spotify.middleware.ProfilingMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -66,6 +67,43 @@ CSRF_TRUSTED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 SESSION_COOKIE_NAME = "spm_session"
 
+# Request profiling (opt-in). Staff can force a cProfile run with the X-Profile
+# header or ?_profile=1; PROFILE_SLOW_MS > 0 also captures any slower request.
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_SLOW_MS = int(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "50"))
+
+# Single-flight coalescing of identical upstream fetches. Always on within a
+# process; SPOTIFY_COALESCE_SHARED also coordinates across worker processes
+# through the default cache, so CACHES must point at a shared backend for it.
+# The result TTL only needs to cover followers' poll interval; the result is
+# handed to callers that waited on that flight, never served to later ones.
+SPOTIFY_COALESCE_SHARED = os.getenv("SPOTIFY_COALESCE_SHARED", "false").lower() == "true"
+SPOTIFY_COALESCE_LOCK_TTL = int(os.getenv("SPOTIFY_COALESCE_LOCK_TTL", "60"))
+SPOTIFY_COALESCE_RESULT_TTL = int(os.getenv("SPOTIFY_COALESCE_RESULT_TTL", "5"))
+
+# Time budget (seconds) for paginated summary/detail requests. When it runs out
+# the response carries the pages fetched so far plus a continuation token.
+SPOTIFY_REQUEST_BUDGET = float(os.getenv("SPOTIFY_REQUEST_BUDGET", "20"))
+
+# Post-login warm-up (in-process thread pool). Warm results live in the default
+# cache for SPOTIFY_PREFETCH_TTL seconds.
+SPOTIFY_PREFETCH_ENABLED = os.getenv("SPOTIFY_PREFETCH_ENABLED", "true").lower() == "true"
+SPOTIFY_PREFETCH_WORKERS = int(os.getenv("SPOTIFY_PREFETCH_WORKERS", "2"))
+SPOTIFY_PREFETCH_TTL = int(os.getenv("SPOTIFY_PREFETCH_TTL", "120"))
+SPOTIFY_PREFETCH_LIKED_PAGES = int(os.getenv("SPOTIFY_PREFETCH_LIKED_PAGES", "2"))
+SPOTIFY_PREFETCH_PLAYLISTS = int(os.getenv("SPOTIFY_PREFETCH_PLAYLISTS", "3"))
+
+# Library export: number of upstream pages fetched ahead of the zip writer.
+SPOTIFY_EXPORT_PREFETCH = int(os.getenv("SPOTIFY_EXPORT_PREFETCH", "4"))
+
+# Columnar track store (per playlist snapshot, in-process LRU) and the
+# analytics computed from it (default cache, keyed by snapshot_id).
+SPOTIFY_TRACKSTORE_MAX_SNAPSHOTS = int(os.getenv("SPOTIFY_TRACKSTORE_MAX_SNAPSHOTS", "64"))
+SPOTIFY_STATS_CACHE_TTL = int(os.getenv("SPOTIFY_STATS_CACHE_TTL", str(60 * 60 * 24)))
+
 ROOT_URLCONF = "api.urls"
 
 TEMPLATES = [
@@ -96,6 +134,46 @@ DATABASES = {
     }
 }
 
+# DB_MODE=production tunes SQLite for several worker processes sharing one file:
+# persistent connections, WAL with a busy timeout set on every new connection,
+# IMMEDIATE write transactions (fail-fast lock upgrades become waits), and
+# write-behind batching of token/updated_at updates (spotify/writebehind.py).
+DB_MODE = os.getenv("DB_MODE", "dev").lower()
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "20000"))
+
+if DB_MODE == "production":
+    DATABASES["default"].update({
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "600")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "timeout": DB_BUSY_TIMEOUT_MS / 1000,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS};"
+            ),
+        },
+    })
+
+SPOTIFY_DB_WRITE_BEHIND = os.getenv("SPOTIFY_DB_WRITE_BEHIND", str(DB_MODE == "production")).lower() == "true"
+SPOTIFY_DB_FLUSH_INTERVAL = float(os.getenv("SPOTIFY_DB_FLUSH_INTERVAL", "0.5"))
+
+# Cache. The default is per-process; set DJANGO_CACHE_BACKEND (e.g.
+# django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.redis.RedisCache) and DJANGO_CACHE_LOCATION to share
+# it between workers (needed for cache-backed sessions and shared coalescing).
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", ""),
+    }
+}
+
+# SESSION_BACKEND=cache | cached_db | db (default). cached_db reads through the
+# cache and still persists; cache skips the database entirely.
+SESSION_ENGINE = "django.contrib.sessions.backends." + os.getenv("SESSION_BACKEND", "db")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -8,27 +8,47 @@ Client layer for Spotify API interactions.
 import time
 import requests
 
+from ..profiling import record_upstream
+
 BASE = "https://api.spotify.com/v1"
 
 def _to_url(path_or_url: str) -> str:
     return path_or_url if path_or_url.startswith("http") else f"{BASE}/{path_or_url.lstrip('/')}"
 
 def sp_get(access_token: str, path_or_url: str, *, params=None, timeout=10):
-    return requests.get(
-        _to_url(path_or_url),
-        headers={"Authorization": f"Bearer {access_token}"},
-        params=params or {},
-        timeout=timeout,
-    )
+    url = _to_url(path_or_url)
+    started = time.perf_counter()
+    r = None
+    try:
+        r = requests.get(
+            url,
+            headers={"Authorization": f"Bearer {access_token}"},
+            params=params or {},
+            timeout=timeout,
+        )
+        return r
+    finally:
+        record_upstream("GET", url, r.status_code if r is not None else None, started)
 
-# Optional helper with basic 429 handling
-def sp_get_with_backoff(access_token: str, path_or_url: str, *, params=None, timeout=10, retries=1):
+# Optional helper with basic 429 handling.
+# max_wait caps the Retry-After sleep; past it the 429 response is returned as-is.
+def sp_get_with_backoff(access_token: str, path_or_url: str, *, params=None, timeout=10, retries=1, max_wait=None):
     r = sp_get(access_token, path_or_url, params=params, timeout=timeout)
     if r.status_code == 429 and retries > 0:
-        wait = int(r.headers.get("Retry-After", "1"))
-        time.sleep(max(0, wait))
-        return sp_get_with_backoff(access_token, path_or_url, params=params, timeout=timeout, retries=retries - 1)
+        wait = max(0, int(r.headers.get("Retry-After", "1")))
+        if max_wait is not None and wait > max_wait:
+            return r
+        time.sleep(wait)
+        return sp_get_with_backoff(
+            access_token, path_or_url, params=params, timeout=timeout, retries=retries - 1, max_wait=max_wait
+        )
     return r
 
 def sp_post_form(url: str, *, data: dict, headers: dict, timeout=10):
-    return requests.post(url, data=data, headers=headers, timeout=timeout)
\ No newline at end of file
+    started = time.perf_counter()
+    r = None
+    try:
+        r = requests.post(url, data=data, headers=headers, timeout=timeout)
+        return r
+    finally:
+        record_upstream("POST", url, r.status_code if r is not None else None, started)
\ No newline at end of file
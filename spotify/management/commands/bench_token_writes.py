@@ -0,0 +1,126 @@
+# spotify/management/commands/bench_token_writes.py
+'''
+Benchmark sustained concurrent writes on the token path (set_access_token).
+Runs several worker processes against the configured database, like gunicorn
+workers sharing one SQLite file, and reports throughput and lock errors.
+
+With write-behind on, repeated writes to the same user collapse into one row
+UPDATE, so the report separates calls from rows actually written. Use
+--distinct-users to give every call its own user so nothing can collapse.
+Workers flush every --flush-every calls while they write (the background
+flusher runs too), and a locked flush counts as a lock error like a locked
+direct write.
+
+    python manage.py bench_token_writes --processes 4 --writes 500 --distinct-users
+    DB_MODE=production python manage.py bench_token_writes --processes 4 --writes 500 --distinct-users
+'''
+
+import multiprocessing
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.utils import timezone
+
+from spotify import writebehind
+from spotify.models import SpotifyUser
+from spotify.utils import encrypt_token, set_access_token
+
+BENCH_PREFIX = "bench-token-writes-"
+
+def _flush() -> bool:
+    """
+    One write-behind flush. False if the database was locked; the batch then
+    stays queued for the next flush.
+    """
+    try:
+        writebehind.flush()
+    except OperationalError as e:
+        if "locked" not in str(e):
+            raise
+        return False
+    return True
+
+def _worker(args):
+    index, writes, users_per_worker, flush_every = args
+    connections.close_all()  # never share the parent's connection across fork
+    users = list(SpotifyUser.objects.filter(
+        spotify_id__in=[f"{BENCH_PREFIX}{index}-{u}" for u in range(users_per_worker)]
+    ))
+    behind = writebehind.enabled()
+    ok = locked = 0
+    started = time.perf_counter()
+    for n in range(writes):
+        try:
+            set_access_token(users[n % len(users)], f"token-{index}-{n}", 3600)
+            ok += 1
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+        if behind and (n + 1) % flush_every == 0 and not _flush():
+            locked += 1
+    if behind:
+        while not _flush():  # drain the tail
+            locked += 1
+        counters = writebehind.flush_stats()
+        rows, flushes = counters["rows"], counters["flushes"]
+        locked += counters["failed"]  # background flusher
+    else:
+        rows, flushes = ok, 0
+    elapsed = time.perf_counter() - started
+    connections.close_all()
+    return ok, locked, elapsed, rows, flushes
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent set_access_token writes across worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--writes", type=int, default=500, help="writes per process")
+        parser.add_argument("--users", type=int, default=4, help="distinct users per process")
+        parser.add_argument(
+            "--flush-every", type=int, default=50,
+            help="with write-behind, flush after this many calls (on top of the background flusher)",
+        )
+        parser.add_argument(
+            "--distinct-users", action="store_true",
+            help="one user per write (overrides --users), so write-behind cannot collapse writes",
+        )
+
+    def handle(self, *args, processes, writes, users, flush_every, distinct_users, **options):
+        if distinct_users:
+            users = writes
+        SpotifyUser.objects.filter(spotify_id__startswith=BENCH_PREFIX).delete()
+        expires = timezone.now() + timedelta(hours=1)
+        refresh = encrypt_token("bench-refresh")
+        SpotifyUser.objects.bulk_create([
+            SpotifyUser(spotify_id=f"{BENCH_PREFIX}{p}-{u}", refresh_token=refresh, expires_at=expires)
+            for p in range(processes) for u in range(users)
+        ])
+        connections.close_all()
+
+        try:
+            ctx = multiprocessing.get_context("fork")
+            started = time.perf_counter()
+            with ctx.Pool(processes) as pool:
+                results = pool.map(
+                    _worker, [(p, writes, users, max(1, flush_every)) for p in range(processes)]
+                )
+            wall = time.perf_counter() - started
+        finally:
+            SpotifyUser.objects.filter(spotify_id__startswith=BENCH_PREFIX).delete()
+
+        ok = sum(r[0] for r in results)
+        locked = sum(r[1] for r in results)
+        slowest = max(r[2] for r in results)
+        rows = sum(r[3] for r in results)
+        flushes = sum(r[4] for r in results)
+        self.stdout.write(
+            f"processes={processes} writes/process={writes} users/process={users} "
+            f"write_behind={writebehind.enabled()}\n"
+            f"  calls={ok} locked_errors={locked} rows_written={rows} flushes={flushes}\n"
+            f"  wall={wall:.2f}s slowest_worker={slowest:.2f}s "
+            f"calls/s={ok / wall:.0f} rows/s={rows / wall:.0f}"
+        )
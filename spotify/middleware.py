@@ -0,0 +1,145 @@
+# spotify/middleware.py
+'''
+Middleware for the Spotify app.
+ - ProfilingMiddleware: opt-in cProfile runs for staff, automatic capture of slow requests.
+Streamed responses (e.g. the export) stay profiled until their body is fully sent;
+their capture is written then, under the name already returned in X-Profile-Capture.
+'''
+
+import contextvars
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import profiling
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "_profile"
+_END = object()
+
+class ProfilingMiddleware:
+    """
+    Must sit after AuthenticationMiddleware (the explicit flag is staff-only).
+    Disabled entirely unless PROFILE_ENABLED is true.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "PROFILE_ENABLED", False):
+            return self.get_response(request)
+
+        slow_ms = getattr(settings, "PROFILE_SLOW_MS", 0)
+        forced = self._wants_profile(request)
+        if not forced and slow_ms <= 0:
+            return self.get_response(request)
+
+        token = profiling.start_trace()
+        tid = threading.get_ident()
+        sampler = None
+        profiler = None
+        if forced:
+            profiler = cProfile.Profile()
+        else:
+            sampler = profiling.get_sampler()
+            sampler.register(tid)
+
+        started = time.perf_counter()
+        streamed = False
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+            streamed = response.streaming and not getattr(response, "is_async", False)
+            ctx = contextvars.copy_context() if streamed else None
+        finally:
+            upstream = profiling.stop_trace(token)  # the same list keeps filling inside ctx
+            samples = sampler.unregister(tid) if sampler is not None else None
+
+        if streamed:
+            name = profiling.capture_name()
+            if forced:
+                response["X-Profile-Capture"] = name
+            response.streaming_content = self._stream(
+                response.streaming_content, ctx, profiler, sampler, samples,
+                request, response, started, upstream, forced, slow_ms, name,
+            )
+            return response
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if forced or elapsed_ms >= slow_ms:
+            name = self._save(request, response, elapsed_ms, upstream, profiler, samples, forced)
+            if forced and name:
+                response["X-Profile-Capture"] = name
+        return response
+
+    def _stream(
+        self, content, ctx, profiler, sampler, samples, request, response, started, upstream, forced, slow_ms, name,
+    ):
+        """
+        Re-yield a streamed body with the trace context, profiler and sampler active
+        while each chunk is produced; the capture is saved once the stream ends.
+        """
+        it = iter(content)
+        tid = threading.get_ident()  # not necessarily the thread that ran the view
+        if sampler is not None:
+            sampler.register(tid)
+        try:
+            while True:
+                if profiler is not None:
+                    chunk = profiler.runcall(ctx.run, next, it, _END)
+                else:
+                    chunk = ctx.run(next, it, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if sampler is not None:
+                samples = samples + sampler.unregister(tid)
+            if forced or elapsed_ms >= slow_ms:
+                self._save(request, response, elapsed_ms, upstream, profiler, samples, forced, name)
+
+    @staticmethod
+    def _save(request, response, elapsed_ms, upstream, profiler, samples, forced, name=None):
+        report = {
+            "at": timezone.now().isoformat(),
+            "reason": "requested" if forced else "slow",
+            "method": request.method,
+            "path": request.path,
+            "route": getattr(request.resolver_match, "route", None),
+            "status": response.status_code,
+            "ms": round(elapsed_ms, 1),
+            "upstream": upstream,
+            "upstream_ms": round(sum(c["ms"] for c in upstream), 1),
+            "streamed": response.streaming,
+        }
+        if profiler is not None:
+            report["profile"] = _format_profile(profiler)
+        if samples:
+            report["samples"] = [
+                {"stack": stack, "count": n} for stack, n in samples.most_common(50)
+            ]
+        try:
+            return profiling.save_capture(report, name)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _wants_profile(request) -> bool:
+        if not (request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)):
+            return False
+        user = getattr(request, "user", None)
+        return bool(user is not None and user.is_staff)
+
+def _format_profile(profiler: cProfile.Profile, limit: int = 40) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
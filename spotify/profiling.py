@@ -0,0 +1,181 @@
+# spotify/profiling.py
+'''
+Opt-in request profiling.
+ - Records an upstream call trace (every Spotify request made while serving a request).
+ - Runs a view under cProfile when a staff user asks for it (X-Profile header or ?_profile=1).
+ - Samples stacks of in-flight requests at a low rate so slow requests can be captured automatically.
+ - Stores captures as JSON files in a bounded on-disk ring (PROFILE_DIR, PROFILE_MAX_CAPTURES).
+'''
+
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from django.conf import settings
+
+_trace: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
+    "spotify_upstream_trace", default=None
+)
+
+# ---- Upstream call trace ----------------------------------------------------
+
+def start_trace() -> contextvars.Token:
+    """
+    Begin collecting upstream calls for the current request.
+    """
+    return _trace.set([])
+
+def stop_trace(token: contextvars.Token) -> List[Dict[str, Any]]:
+    """
+    Stop collecting and return the calls recorded since start_trace(). It is the
+    list itself, so copies of the context taken earlier keep appending to it.
+    """
+    calls = _trace.get()
+    _trace.reset(token)
+    return calls if calls is not None else []
+
+def record_upstream(method: str, url: str, status: Optional[int], started: float) -> None:
+    """
+    Called by the client layer after each Spotify request. No-op unless a trace is active.
+    """
+    calls = _trace.get()
+    if calls is None:
+        return
+    calls.append({
+        "method": method,
+        "url": url,
+        "status": status,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+# ---- Low-overhead stack sampler ---------------------------------------------
+
+class StackSampler:
+    """
+    One daemon thread that periodically samples the stacks of registered threads.
+    Each registered thread gets a Counter of collapsed stacks ("file:func;file:func").
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._samples: Dict[int, Counter] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, thread_id: int) -> None:
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def unregister(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._samples.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._samples:
+                    continue
+                frames = sys._current_frames()
+                for tid, counter in self._samples.items():
+                    frame = frames.get(tid)
+                    if frame is not None:
+                        counter[_collapse(frame)] += 1
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+_sampler: Optional[StackSampler] = None
+_sampler_lock = threading.Lock()
+
+def get_sampler() -> StackSampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            interval_ms = getattr(settings, "PROFILE_SAMPLE_INTERVAL_MS", 10)
+            _sampler = StackSampler(max(1, interval_ms) / 1000)
+        return _sampler
+
+# ---- On-disk ring -----------------------------------------------------------
+
+_ring_lock = threading.Lock()
+_CAPTURE_NAME = re.compile(r"^[0-9]+-[0-9a-f]+\.json$")
+
+def _profile_dir() -> Path:
+    return Path(getattr(settings, "PROFILE_DIR", settings.BASE_DIR / "profiles"))
+
+def capture_name() -> str:
+    return f"{time.time_ns()}-{os.getpid():x}.json"
+
+def save_capture(report: Dict[str, Any], name: Optional[str] = None) -> str:
+    """
+    Write a capture and drop the oldest files beyond PROFILE_MAX_CAPTURES.
+    Returns the capture name (`name` if given, e.g. one announced before a stream ends).
+    """
+    directory = _profile_dir()
+    limit = max(1, getattr(settings, "PROFILE_MAX_CAPTURES", 50))
+    name = name or capture_name()
+
+    with _ring_lock:
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f".{name}.tmp"
+        tmp.write_text(json.dumps(report, default=str))
+        tmp.replace(directory / name)
+
+        existing = sorted(p.name for p in directory.iterdir() if _CAPTURE_NAME.match(p.name))
+        for old in existing[: max(0, len(existing) - limit)]:
+            try:
+                (directory / old).unlink()
+            except FileNotFoundError:
+                pass
+    return name
+
+def list_captures() -> List[Dict[str, Any]]:
+    """
+    Newest-first summaries of stored captures (no profile bodies).
+    """
+    directory = _profile_dir()
+    if not directory.is_dir():
+        return []
+    out = []
+    for name in sorted((p.name for p in directory.iterdir() if _CAPTURE_NAME.match(p.name)), reverse=True):
+        report = load_capture(name)
+        if report is None:
+            continue
+        out.append({
+            "name": name,
+            "at": report.get("at"),
+            "method": report.get("method"),
+            "path": report.get("path"),
+            "route": report.get("route"),
+            "status": report.get("status"),
+            "ms": report.get("ms"),
+            "reason": report.get("reason"),
+            "upstream_calls": len(report.get("upstream", [])),
+        })
+    return out
+
+def load_capture(name: str) -> Optional[Dict[str, Any]]:
+    if not _CAPTURE_NAME.match(name):
+        return None
+    try:
+        return json.loads((_profile_dir() / name).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
@@ -16,12 +16,11 @@ import secrets
 from datetime import timedelta
 from typing import Dict, Any
 
-import requests
 from django.utils import timezone
 
 from ..models import SpotifyUser
 from ..utils import encrypt_token
-from ..clients.spotify import sp_post_form
+from ..clients.spotify import sp_get, sp_post_form
 
 # Environment
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
@@ -89,11 +88,7 @@ def fetch_me(access_token: str) -> Dict[str, Any]:
     """
     GET /v1/me using the provided access token. Raises on non-200.
     """
-    r = requests.get(
-        "https://api.spotify.com/v1/me",
-        headers={"Authorization": f"Bearer {access_token}"},
-        timeout=10,
-    )
+    r = sp_get(access_token, "me", timeout=10)
     r.raise_for_status()
     return r.json()
 
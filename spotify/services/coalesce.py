@@ -0,0 +1,101 @@
+# spotify/services/coalesce.py
+'''
+Single-flight request coalescing for the service layer.
+ - Concurrent callers with the same key share one in-flight computation.
+ - With SPOTIFY_COALESCE_SHARED enabled, the lock and result also go through the
+   Django cache so workers in other processes waiting on the same flight share
+   the leader's result. It is handed over, not cached: later callers recompute.
+'''
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+_inflight: Dict[Hashable, _Call] = {}
+_lock = threading.Lock()
+
+def single_flight(key: Tuple[Hashable, ...], fn: Callable[[], Any]) -> Any:
+    """
+    Run fn() once per key among concurrent callers and hand everyone the same result.
+    Exceptions raised by the leader are re-raised in every waiting caller.
+    """
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if getattr(settings, "SPOTIFY_COALESCE_SHARED", False):
+            call.result = _shared_flight(key, fn)
+        else:
+            call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+# ---- Cross-process mode -----------------------------------------------------
+
+def _shared_flight(key: Tuple[Hashable, ...], fn: Callable[[], Any]) -> Any:
+    """
+    Leader election through cache.add(); the lock value is a fresh token and the
+    leader stores its result under that token. Only followers that saw the token
+    while the lock was held know where to look, so a caller arriving after the
+    flight finished computes afresh instead of reading a stale result.
+    Followers fall back to computing it themselves if the lock goes away without one.
+    """
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    lock_key = f"sf:lock:{digest}"
+    lock_ttl = getattr(settings, "SPOTIFY_COALESCE_LOCK_TTL", 60)
+    result_ttl = getattr(settings, "SPOTIFY_COALESCE_RESULT_TTL", 5)
+    poll = getattr(settings, "SPOTIFY_COALESCE_POLL_INTERVAL", 0.05)
+
+    missing = object()
+    token = uuid.uuid4().hex
+    seen = None
+    deadline = time.monotonic() + lock_ttl
+    while True:
+        holder = cache.get(lock_key)
+        if holder is not None:
+            seen = holder
+        elif seen is not None:
+            hit = cache.get(f"sf:result:{digest}:{seen}", missing)
+            if hit is not missing:
+                return hit
+            seen = None  # leader failed; try to take over
+        if holder is None and cache.add(lock_key, token, timeout=lock_ttl):
+            try:
+                result = fn()
+                cache.set(f"sf:result:{digest}:{token}", result, timeout=result_ttl)
+                return result
+            finally:
+                cache.delete(lock_key)
+        if time.monotonic() >= deadline:
+            return fn()
+        time.sleep(poll)
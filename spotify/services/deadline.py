@@ -0,0 +1,71 @@
+# spotify/services/deadline.py
+'''
+Per-request time budget for paginated service calls.
+ - Deadline: created once per request and passed down; loops check it between pages.
+ - Continuation tokens: signed, opaque resume points handed back when the budget runs out.
+ - RateLimited: raised when Spotify's Retry-After outlasts the budget before any page arrived.
+'''
+
+from __future__ import annotations
+
+import time
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core import signing
+
+_CONTINUATION_SALT = "spotify.continuation"
+
+class Deadline:
+    """
+    Monotonic deadline. `expired()` is checked before each page; `timeout()` caps
+    per-request HTTP timeouts and `remaining()` caps 429 backoff sleeps.
+    """
+
+    __slots__ = ("at",)
+
+    def __init__(self, seconds: float):
+        self.at = time.monotonic() + seconds
+
+    @classmethod
+    def for_request(cls) -> "Deadline":
+        return cls(getattr(settings, "SPOTIFY_REQUEST_BUDGET", 20))
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, timeout: float, floor: float = 1.0) -> float:
+        return min(timeout, max(floor, self.remaining()))
+
+class RateLimited(Exception):
+    """
+    No progress was possible within the budget; retry after `retry_after` seconds.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Rate limited by Spotify; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class InvalidContinuation(Exception):
+    """
+    Token is malformed, tampered with, or belongs to another endpoint/playlist (a client bug).
+    """
+
+class StaleContinuation(Exception):
+    """
+    Token was issued for an older snapshot; the client should reload.
+    """
+
+def make_continuation(**state: Any) -> str:
+    return signing.dumps(state, salt=_CONTINUATION_SALT)
+
+def read_continuation(token: Optional[str]) -> Dict[str, Any]:
+    if not token:
+        return {}
+    try:
+        return signing.loads(token, salt=_CONTINUATION_SALT)
+    except signing.BadSignature:
+        raise InvalidContinuation("Malformed continuation token")
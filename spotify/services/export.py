@@ -0,0 +1,160 @@
+# spotify/services/export.py
+'''
+This module streams a full-library backup as a zip archive.
+ - export_library_zip: Yields zip bytes with one NDJSON/CSV file per playlist plus liked songs.
+Pages are fetched with a bounded number of prefetches in flight and written to the
+archive as they arrive, so memory stays flat regardless of library size.
+'''
+
+from __future__ import annotations
+
+import contextvars
+import csv
+import io
+import json
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, Optional
+
+from django.conf import settings
+
+from ..utils import get_valid_access_token, refresh_access_token
+from ..clients.spotify import sp_get_with_backoff
+from .tracks import lite_track
+
+TIMEOUT = 15
+FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ["id", "name", "artists", "album", "image", "duration_ms", "preview_url", "uri", "added_at"]
+
+PLAYLIST_FIELDS = "items(id,name,owner(display_name),tracks(total)),total"
+TRACK_FIELDS = (
+    "items(added_at,track(id,name,uri,duration_ms,preview_url,"
+    "artists(name),album(name,images(url)))),total"
+)
+
+class _Fetcher:
+    """
+    Holds the access token and the prefetch pool for one export.
+    Worker threads only do HTTP; token refreshes (DB writes) stay on the caller's thread.
+    Each fetch runs in a copy of the caller's context so upstream calls land in its trace.
+    """
+
+    def __init__(self, user, pool: ThreadPoolExecutor, prefetch: int):
+        self.user = user
+        self.pool = pool
+        self.prefetch = prefetch
+        self.token = get_valid_access_token(user)
+
+    def _submit(self, path: str, params: Dict[str, Any]):
+        ctx = contextvars.copy_context()
+        return self.pool.submit(
+            ctx.run, sp_get_with_backoff, self.token, path, params=params, timeout=TIMEOUT
+        )
+
+    def _resolve(self, future, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        r = future.result()
+        if r.status_code == 401:
+            self.token = refresh_access_token(self.user)
+            r = sp_get_with_backoff(self.token, path, params=params, timeout=TIMEOUT)
+        r.raise_for_status()
+        return r.json()
+
+    def items(self, path: str, *, limit: int, fields: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every item of an offset-paginated collection in order.
+        The first page gives the total; later pages are prefetched `prefetch` at a time.
+        """
+        def params(offset: int) -> Dict[str, Any]:
+            p = {"limit": limit, "offset": offset}
+            if fields:
+                p["fields"] = fields
+            return p
+
+        first = self._resolve(self._submit(path, params(0)), path, params(0))
+        yield from first.get("items", [])
+
+        offsets = iter(range(limit, int(first.get("total", 0)), limit))
+        pending = deque()
+        for offset in offsets:
+            pending.append((offset, self._submit(path, params(offset))))
+            if len(pending) >= self.prefetch:
+                break
+        while pending:
+            offset, future = pending.popleft()
+            page = self._resolve(future, path, params(offset))
+            nxt = next(offsets, None)
+            if nxt is not None:
+                pending.append((nxt, self._submit(path, params(nxt))))
+            yield from page.get("items", [])
+
+class _Sink(io.RawIOBase):
+    """
+    Unseekable write target for ZipFile; drain() hands back what was written so far.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w\- ]+", "_", name or "").strip()[:80] or "untitled"
+
+def _write_entry(zf: zipfile.ZipFile, sink: _Sink, name: str, items: Iterator[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    """
+    Stream one archive member; yields compressed bytes as they are produced.
+    """
+    with zf.open(name, "w", force_zip64=True) as member:
+        text = io.TextIOWrapper(member, encoding="utf-8", newline="", write_through=True)
+        writer = None
+        if fmt == "csv":
+            writer = csv.writer(text)
+            writer.writerow(CSV_COLUMNS)
+        for item in items:
+            if not item.get("track"):
+                continue  # removed / unavailable tracks
+            row = lite_track(item)
+            if writer is not None:
+                row["artists"] = "; ".join(row["artists"])
+                writer.writerow([row[c] for c in CSV_COLUMNS])
+            else:
+                text.write(json.dumps(row, ensure_ascii=False) + "\n")
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        text.flush()
+        text.detach()
+    yield sink.drain()
+
+def export_library_zip(user, fmt: str = "ndjson") -> Iterator[bytes]:
+    """
+    Generator of zip bytes: liked_songs.<fmt> and playlists/<name>-<id>.<fmt>.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    prefetch = max(1, getattr(settings, "SPOTIFY_EXPORT_PREFETCH", 4))
+    sink = _Sink()
+    with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="export") as pool:
+        fetch = _Fetcher(user, pool, prefetch)
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            liked = fetch.items("me/tracks", limit=50)
+            yield from _write_entry(zf, sink, f"liked_songs.{fmt}", liked, fmt)
+
+            for pl in fetch.items("me/playlists", limit=50, fields=PLAYLIST_FIELDS):
+                tracks = fetch.items(f"playlists/{pl['id']}/tracks", limit=100, fields=TRACK_FIELDS)
+                name = f"playlists/{_safe_name(pl.get('name'))}-{pl['id']}.{fmt}"
+                yield from _write_entry(zf, sink, name, tracks, fmt)
+        yield sink.drain()
@@ -0,0 +1,184 @@
+# spotify/services/playlist_pages.py
+'''
+This module serves playlist detail one sorted/filtered page at a time.
+ - playlist_page: A page of a playlist's tracks, sorted by SORT_KEYS and filtered by text.
+ - playlist_columnar: Every track in the compact columnar wire format.
+Pages are slices of the snapshot's precomputed sort index (services/trackstore.py).
+Cursors are signed and carry the snapshot, so a cursor never silently spans an edit.
+
+Columnar format ("format": "columnar"): tracks holds parallel arrays (ids, names,
+duration_ms, added_at, image). Artists use CSR layout: the artists of row i are
+artist_refs[artist_offsets[i]:artist_offsets[i + 1]]. Artist refs and image refs
+index into the "dictionaries" tables; an image ref of -1 means no image.
+
+Both formats here are read from the track store, which leaves out unavailable
+(null) tracks, so their `total` counts playable tracks only. The unpaged default
+detail (services/playlists.py) lists every entry, null ones included.
+'''
+
+from __future__ import annotations
+
+from typing import Dict, Any, List, Optional
+
+from django.core import signing
+
+from .playlists import playlist_info
+from .trackstore import SORT_KEYS, TrackColumns, playlist_columns
+
+ORDERS = ("asc", "desc")
+FORMATS = ("rows", "columnar")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+_CURSOR_SALT = "spotify.playlist_page"
+
+class InvalidCursor(Exception):
+    """
+    Cursor is malformed, tampered with, or was issued for another playlist (a client bug).
+    """
+
+class StaleCursor(Exception):
+    """
+    Cursor was issued for an older snapshot; the client should reload.
+    """
+
+def materialize(cols: TrackColumns, row: int) -> Dict[str, Any]:
+    """
+    Rebuild one entry in the same shape playlist_detail returns (plus added_at).
+    """
+    img = cols.image_refs[row]
+    return {
+        "added_at": cols.added_at[row],
+        "track": {
+            "id": cols.ids[row],
+            "name": cols.names[row],
+            "artists": [{"name": cols.artist_names[r]} for r in cols.artists_of(row)],
+            "duration_ms": cols.durations[row],
+            "album": {"images": [{"url": u} for u in cols.images[img]] if img >= 0 else []},
+        },
+    }
+
+def encode_columnar(cols: TrackColumns, rows: Optional[List[int]] = None) -> tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    (tracks, dictionaries) for the given rows, or for every row when rows is None.
+    Every row reuses the store's own tables as-is; a subset gets page-local tables.
+    """
+    if rows is None:
+        tracks = {
+            "ids": cols.ids,
+            "names": cols.names,
+            "duration_ms": cols.durations.tolist(),
+            "added_at": cols.added_at,
+            "artist_offsets": cols.artist_offsets.tolist(),
+            "artist_refs": cols.artist_refs.tolist(),
+            "image": cols.image_refs.tolist(),
+        }
+        return tracks, {"artists": cols.artist_names, "images": [list(t) for t in cols.images]}
+
+    artist_local: Dict[int, int] = {}
+    image_local: Dict[int, int] = {}
+    offsets = [0]
+    refs: List[int] = []
+    image: List[int] = []
+    for row in rows:
+        for r in cols.artists_of(row):
+            refs.append(artist_local.setdefault(r, len(artist_local)))
+        offsets.append(len(refs))
+        img = cols.image_refs[row]
+        image.append(image_local.setdefault(img, len(image_local)) if img >= 0 else -1)
+
+    tracks = {
+        "ids": [cols.ids[r] for r in rows],
+        "names": [cols.names[r] for r in rows],
+        "duration_ms": [cols.durations[r] for r in rows],
+        "added_at": [cols.added_at[r] for r in rows],
+        "artist_offsets": offsets,
+        "artist_refs": refs,
+        "image": image,
+    }
+    dictionaries = {
+        "artists": [cols.artist_names[r] for r in artist_local],
+        "images": [list(cols.images[r]) for r in image_local],
+    }
+    return tracks, dictionaries
+
+def page_rows(cols: TrackColumns, *, sort: str, order: str, q: str, offset: int, limit: int) -> tuple[List[int], int]:
+    """
+    Row numbers for one page plus the filtered total.
+    """
+    rows = cols.filtered_index(sort, q, descending=order == "desc")
+    return list(rows[offset:offset + limit]), len(rows)
+
+def playlist_page(
+    user, pid: str, *, sort: str = "position", order: str = "asc", q: str = "",
+    limit: Optional[int] = None, cursor: Optional[str] = None, fmt: str = "rows",
+) -> Dict[str, Any]:
+    """
+    Returns { id, name, images, owner, snapshot_id, tracks: { items, total, next_cursor } }.
+    When a cursor is given, its sort/order/q win over the arguments; limit defaults
+    to the cursor's (or DEFAULT_LIMIT) unless passed explicitly.
+    """
+    pinfo = playlist_info(user, pid)
+    snapshot = pinfo.get("snapshot_id")
+
+    offset = 0
+    if cursor:
+        try:
+            state = signing.loads(cursor, salt=_CURSOR_SALT)
+        except signing.BadSignature:
+            raise InvalidCursor("Malformed cursor")
+        if state.get("p") != pid:
+            raise InvalidCursor("Cursor belongs to another playlist")
+        if state.get("s") != snapshot:
+            raise StaleCursor("Playlist changed since this cursor was issued")
+        sort, order, q, offset = state["k"], state["d"], state["q"], state["o"]
+        if limit is None:
+            limit = state.get("l")
+
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of: {', '.join(ORDERS)}")
+    limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+
+    cols = playlist_columns(user, pid, pinfo)
+    rows, total = page_rows(cols, sort=sort, order=order, q=q, offset=offset, limit=limit)
+
+    next_cursor = None
+    if offset + limit < total:
+        next_cursor = signing.dumps(
+            {"p": pid, "s": snapshot, "k": sort, "d": order, "q": q, "o": offset + limit, "l": limit},
+            salt=_CURSOR_SALT,
+        )
+
+    header = _header(pinfo)
+    if fmt == "columnar":
+        tracks, dictionaries = encode_columnar(cols, rows)
+        tracks.update({"total": total, "next_cursor": next_cursor})
+        return {**header, "format": "columnar", "tracks": tracks, "dictionaries": dictionaries}
+    return {
+        **header,
+        "tracks": {
+            "items": [materialize(cols, r) for r in rows],
+            "total": total,
+            "next_cursor": next_cursor,
+        },
+    }
+
+def playlist_columnar(user, pid: str) -> Dict[str, Any]:
+    """
+    Full playlist in the columnar format, straight from the snapshot's columns.
+    """
+    pinfo = playlist_info(user, pid)
+    cols = playlist_columns(user, pid, pinfo)
+    tracks, dictionaries = encode_columnar(cols)
+    tracks["total"] = len(cols)
+    return {**_header(pinfo), "format": "columnar", "tracks": tracks, "dictionaries": dictionaries}
+
+def _header(pinfo: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": pinfo["id"],
+        "name": pinfo["name"],
+        "images": pinfo.get("images", []),
+        "owner": pinfo.get("owner"),
+        "snapshot_id": pinfo.get("snapshot_id"),
+    }
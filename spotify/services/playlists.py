@@ -4,24 +4,66 @@ This module provides functions to for use by playlist grid and playlist detail v
  - list_user_playlists: Get a single page of playlists for the current user.
  - summarize_user_playlists: Get a light summary of all playlists for the current user.
  - playlist_detail: Get detailed information about a specific playlist, including all tracks.
+ - *_partial variants: Stop when a per-request Deadline runs out and report where to resume.
+ - playlist_info / iter_track_pages / detail_item(s): Building blocks shared with the track store and warm-up.
+Identical concurrent calls are coalesced (see services/coalesce.py), and results
+prepared by the login warm-up (services/prefetch.py) are served first.
 '''
 
 from __future__ import annotations
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from ..utils import get_valid_access_token, refresh_access_token
 from ..clients.spotify import sp_get, sp_get_with_backoff
+from .coalesce import single_flight
+from .deadline import Deadline, RateLimited, StaleContinuation
+from . import warm
 
 TIMEOUT = 10
 TRACK_TIMEOUT = 15
+DETAIL_TRACK_FIELDS = "track(id,name,artists(name),duration_ms,album(images(url)))"
+SUMMARY_PATH = "me/playlists?fields=items(id,name,images(url),tracks(total),owner(display_name),public,snapshot_id),next"
 
-def _get(token: str, path_or_url: str, *, params=None, timeout=TIMEOUT, backoff=False):
+def _get(token: str, path_or_url: str, *, params=None, timeout=TIMEOUT, backoff=False, deadline=None):
     """
     One place to choose plain GET vs backoff GET.
+    A deadline caps the HTTP timeout and the 429 backoff sleep.
     """
-    r = (sp_get_with_backoff if backoff else sp_get)(
-        token, path_or_url, params=params, timeout=timeout
-    )
-    return r
+    if deadline is not None:
+        timeout = deadline.timeout(timeout)
+    if backoff:
+        max_wait = deadline.remaining() if deadline is not None else None
+        return sp_get_with_backoff(token, path_or_url, params=params, timeout=timeout, max_wait=max_wait)
+    return sp_get(token, path_or_url, params=params, timeout=timeout)
+
+def _walk(
+    user, path: str, *, limit: int, offset: int = 0, timeout=TIMEOUT, deadline: Optional[Deadline] = None
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[int]]]:
+    """
+    Yield (items, next_offset) for each page of an offset-paginated collection;
+    next_offset is None after the last page. With a deadline, stops before the next
+    page once the budget is spent or Spotify is still rate-limiting us; if that
+    happens before the first page, raises RateLimited so the caller can back off.
+    """
+    token = get_valid_access_token(user)
+    url = f"{path}{'&' if '?' in path else '?'}limit={limit}&offset={offset}"
+    progressed = False
+    while url:
+        if deadline is not None and deadline.expired():
+            return
+        r = _get(token, url, timeout=timeout, backoff=True, deadline=deadline)
+        if r.status_code == 401:
+            token = refresh_access_token(user)
+            r = _get(token, url, timeout=timeout, backoff=True, deadline=deadline)
+        if r.status_code == 429 and deadline is not None:
+            if not progressed:
+                raise RateLimited(int(r.headers.get("Retry-After", "1")))
+            return
+        r.raise_for_status()
+        data = r.json()
+        url = data.get("next")  # full URL or None
+        offset += limit
+        progressed = True
+        yield data.get("items", []), (offset if url else None)
 
 def list_user_playlists(
     user, *, limit: int = 50, offset: int = 0, fields: Optional[str] = None
@@ -29,39 +71,46 @@ def list_user_playlists(
     """
     Single page from /me/playlists. Returns raw Spotify JSON for that page.
     """
-    token = get_valid_access_token(user)
-    path = f"me/playlists?limit={limit}&offset={offset}"
-    if fields:
-        path += f"&fields={fields}"
+    def fetch():
+        token = get_valid_access_token(user)
+        path = f"me/playlists?limit={limit}&offset={offset}"
+        if fields:
+            path += f"&fields={fields}"
 
-    r = _get(token, path, timeout=TIMEOUT)
-    if r.status_code == 401:
-        token = refresh_access_token(user)
         r = _get(token, path, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.json()
+        if r.status_code == 401:
+            token = refresh_access_token(user)
+            r = _get(token, path, timeout=TIMEOUT)
+        r.raise_for_status()
+        return r.json()
+
+    return single_flight((user.spotify_id, "list_user_playlists", limit, offset, fields), fetch)
 
 def summarize_user_playlists(user) -> List[Dict[str, Any]]:
     """
-    Light list for your center grid: [{id, name, image_url, tracks_total}]
+    Light list for your center grid: [{id, name, image_url, tracks_total, public, snapshot_id}]
     """
-    token = get_valid_access_token(user)
-    url = (
-        "me/playlists"
-        "?limit=50"
-        "&fields=items(id,name,images(url),tracks(total),owner(display_name),public),next"
+    return single_flight((user.spotify_id, "summarize_user_playlists"), lambda: _summarize(user)["items"])
+
+def summarize_user_playlists_partial(user, *, deadline: Deadline, offset: int = 0) -> Dict[str, Any]:
+    """
+    summarize_user_playlists bounded by `deadline`, optionally resuming at `offset`.
+    Returns { items, next_offset } where next_offset is None once the list is complete.
+    """
+    if offset == 0:
+        hit = warm.take((user.spotify_id, "summary"))
+        if hit is not None:
+            return hit
+    return single_flight(
+        (user.spotify_id, "summarize_user_playlists", "partial", offset),
+        lambda: _summarize(user, deadline=deadline, offset=offset),
     )
 
+def _summarize(user, *, deadline: Optional[Deadline] = None, offset: int = 0) -> Dict[str, Any]:
     items: List[Dict[str, Any]] = []
-    while url:
-        r = _get(token, url, timeout=TIMEOUT, backoff=True)
-        if r.status_code == 401:
-            token = refresh_access_token(user)
-            r = _get(token, url, timeout=TIMEOUT, backoff=True)
-        r.raise_for_status()
-        data = r.json()
-        items.extend(data.get("items", []))
-        url = data.get("next")  # full URL or None
+    next_offset: Optional[int] = offset
+    for page, next_offset in _walk(user, SUMMARY_PATH, limit=50, offset=offset, deadline=deadline):
+        items.extend(page)
 
     summaries = []
     for pl in items:
@@ -71,43 +120,121 @@ def summarize_user_playlists(user) -> List[Dict[str, Any]]:
             "name": pl["name"],
             "image_url": img,
             "tracks_total": pl.get("tracks", {}).get("total", 0),
+            "public": pl.get("public"),
+            "snapshot_id": pl.get("snapshot_id"),
         })
-    return summaries
+    return {"items": summaries, "next_offset": next_offset}
 
 def playlist_detail(user, pid: str) -> Dict[str, Any]:
     """
     Basic playlist info + ALL track entries (id, name, artists, duration_ms, album.images).
+    The info call is per user; track pages are keyed by snapshot and shared across
+    users when the playlist is public.
     """
-    token = get_valid_access_token(user)
+    pinfo = playlist_info(user, pid)
+    scope = track_scope(user, pinfo)
+    items = warm.get((scope, "detail", pid, pinfo.get("snapshot_id")))
+    if items is None:
+        items = single_flight(
+            (scope, "playlist_tracks", pid, pinfo.get("snapshot_id")),
+            lambda: detail_items(user, pid),
+        )
+    return _detail(pinfo, items)
 
-    info = f"playlists/{pid}?fields=id,name,images(url),owner(display_name)"
-    pr = _get(token, info, timeout=TIMEOUT)
-    if pr.status_code == 401:
-        token = refresh_access_token(user)
-        pr = _get(token, info, timeout=TIMEOUT)
-    pr.raise_for_status()
-    pinfo = pr.json()
+def detail_items(user, pid: str) -> List[Dict[str, Any]]:
+    """
+    Every track entry in the playlist_detail shape, null (removed) tracks included.
+    """
+    return [it for page in iter_track_pages(user, pid, DETAIL_TRACK_FIELDS) for it in page]
 
-    items: List[Dict[str, Any]] = []
-    turl = (
-        f"playlists/{pid}/tracks"
-        "?limit=100"
-        "&fields=items(track(id,name,artists(name),duration_ms,album(images(url)))),next"
+def detail_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cut a raw entry fetched with wider fields down to what DETAIL_TRACK_FIELDS returns.
+    """
+    t = item.get("track")
+    if not t:
+        return {"track": t}
+    album = t.get("album") or {}
+    return {"track": {
+        "id": t.get("id"),
+        "name": t.get("name"),
+        "artists": [{"name": a.get("name")} for a in t.get("artists") or []],
+        "duration_ms": t.get("duration_ms"),
+        "album": {"images": [{"url": img.get("url")} for img in album.get("images") or []]},
+    }}
+
+def playlist_detail_partial(
+    user, pid: str, *, deadline: Deadline, offset: int = 0, snapshot_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    playlist_detail bounded by `deadline`, optionally resuming at track `offset`.
+    When resuming, `snapshot_id` must still be current (else StaleContinuation).
+    Adds snapshot_id and next_offset (None once every track is included).
+    """
+    pinfo = playlist_info(user, pid)
+    snapshot = pinfo.get("snapshot_id")
+    if snapshot_id is not None and snapshot_id != snapshot:
+        raise StaleContinuation("Playlist changed since this continuation was issued")
+    scope = track_scope(user, pinfo)
+    if offset == 0:
+        items = warm.get((scope, "detail", pid, snapshot))
+        if items is not None:
+            return {**_detail(pinfo, items), "snapshot_id": snapshot, "next_offset": None}
+
+    def fetch() -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        items: List[Dict[str, Any]] = []
+        next_offset: Optional[int] = offset
+        for page, next_offset in _walk(
+            user, _tracks_path(pid, DETAIL_TRACK_FIELDS), limit=100, offset=offset,
+            timeout=TRACK_TIMEOUT, deadline=deadline,
+        ):
+            items.extend(page)
+        return items, next_offset
+
+    items, next_offset = single_flight(
+        (scope, "playlist_tracks", pid, snapshot, "partial", offset), fetch
     )
-    while turl:
-        tr = _get(token, turl, timeout=TRACK_TIMEOUT, backoff=True)
-        if tr.status_code == 401:
-            token = refresh_access_token(user)
-            tr = _get(token, turl, timeout=TRACK_TIMEOUT, backoff=True)
-        tr.raise_for_status()
-        tdata = tr.json()
-        items.extend(tdata.get("items", []))
-        turl = tdata.get("next")
+    return {**_detail(pinfo, items), "snapshot_id": snapshot, "next_offset": next_offset}
 
+def _detail(pinfo: Dict[str, Any], items: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {
         "id": pinfo["id"],
         "name": pinfo["name"],
         "images": pinfo.get("images", []),
         "owner": pinfo.get("owner"),
         "tracks": {"items": items},
-    }
\ No newline at end of file
+    }
+
+def playlist_info(user, pid: str) -> Dict[str, Any]:
+    """
+    Playlist header: id, name, images, owner, public, snapshot_id.
+    Also serves as the access check before any shared (public/snapshot) data is used.
+    """
+    return single_flight((user.spotify_id, "playlist_info", pid), lambda: _playlist_info(user, pid))
+
+def track_scope(user, pinfo: Dict[str, Any]) -> str:
+    """
+    Sharing scope for snapshot-keyed track data: public playlists are shared across users.
+    """
+    return "public" if pinfo.get("public") else user.spotify_id
+
+def _playlist_info(user, pid: str) -> Dict[str, Any]:
+    token = get_valid_access_token(user)
+    info = f"playlists/{pid}?fields=id,name,images(url),owner(display_name),public,snapshot_id"
+    pr = _get(token, info, timeout=TIMEOUT)
+    if pr.status_code == 401:
+        token = refresh_access_token(user)
+        pr = _get(token, info, timeout=TIMEOUT)
+    pr.raise_for_status()
+    return pr.json()
+
+def iter_track_pages(user, pid: str, fields: str) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Walk /playlists/{pid}/tracks 100 at a time, yielding each page's raw items.
+    `fields` is the Spotify field filter for a single item.
+    """
+    for items, _ in _walk(user, _tracks_path(pid, fields), limit=100, timeout=TRACK_TIMEOUT):
+        yield items
+
+def _tracks_path(pid: str, fields: str) -> str:
+    return f"playlists/{pid}/tracks?fields=items({fields}),next"
@@ -0,0 +1,87 @@
+# spotify/services/prefetch.py
+'''
+Post-login warm-up, run on an in-process thread pool (no broker needed).
+ - enqueue_warmup: Queue a warm-up for a user; at most one per user is in flight.
+The job fetches the playlist summary, the first liked-tracks pages and the first
+few playlists (me/playlists lists the most recently added/created first), so the
+first screen after login is served from cache.
+'''
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from ..models import SpotifyUser
+from . import warm
+from .playlists import detail_item, detail_items, summarize_user_playlists, track_scope
+from .tracks import liked_tracks
+from .trackstore import playlist_columns
+
+logger = logging.getLogger(__name__)
+
+LIKED_PAGE_SIZE = 50
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: Set[str] = set()
+_lock = threading.Lock()
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, getattr(settings, "SPOTIFY_PREFETCH_WORKERS", 2)),
+            thread_name_prefix="prefetch",
+        )
+    return _executor
+
+def enqueue_warmup(user: SpotifyUser) -> bool:
+    """
+    Returns False if prefetch is disabled or this user already has a job queued.
+    """
+    if not getattr(settings, "SPOTIFY_PREFETCH_ENABLED", True):
+        return False
+    with _lock:
+        if user.spotify_id in _pending:
+            return False
+        _pending.add(user.spotify_id)
+        _pool().submit(_run, user.spotify_id)
+    return True
+
+def _run(spotify_id: str) -> None:
+    close_old_connections()
+    try:
+        warm_library(SpotifyUser.objects.get(spotify_id=spotify_id))
+    except Exception:
+        logger.exception("Prefetch failed for %s", spotify_id)
+    finally:
+        with _lock:
+            _pending.discard(spotify_id)
+        close_old_connections()
+
+def warm_library(user: SpotifyUser) -> None:
+    summaries = summarize_user_playlists(user)
+    warm.put((user.spotify_id, "summary"), {"items": summaries, "next_offset": None})
+
+    for page in range(max(0, getattr(settings, "SPOTIFY_PREFETCH_LIKED_PAGES", 2))):
+        data = liked_tracks(user, limit=LIKED_PAGE_SIZE, offset=page * LIKED_PAGE_SIZE)
+        warm.put((user.spotify_id, "liked", LIKED_PAGE_SIZE, page * LIKED_PAGE_SIZE), data)
+        if data["nextOffset"] is None:
+            break
+
+    # One walk per playlist: the raw pages that build the columns also give the
+    # warm detail entry, cut down to the same shape (null tracks kept) a cold
+    # playlist_detail returns. Columns that already existed cost no walk.
+    for s in summaries[: max(0, getattr(settings, "SPOTIFY_PREFETCH_PLAYLISTS", 3))]:
+        pages = []
+        playlist_columns(user, s["id"], s, on_page=pages.append)
+        if pages:
+            items = [detail_item(it) for page in pages for it in page]
+        else:
+            items = detail_items(user, s["id"])
+        warm.put((track_scope(user, s), "detail", s["id"], s.get("snapshot_id")), items)
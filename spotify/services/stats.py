@@ -0,0 +1,170 @@
+# spotify/services/stats.py
+'''
+This module computes playlist analytics from the columnar track store.
+ - playlist_stats: Duration totals, top artists, artist diversity and an added-at histogram for one playlist.
+ - library_stats: The same across every playlist, plus the most-overlapping playlist pairs.
+Results are cached per snapshot_id (the library variant per set of snapshots, built
+from per-snapshot pieces that are cached on their own).
+'''
+
+from __future__ import annotations
+
+import hashlib
+from collections import Counter, defaultdict
+from itertools import combinations
+from typing import Dict, Any, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .playlists import playlist_info, summarize_user_playlists, track_scope
+from .trackstore import TrackColumns, playlist_columns
+
+TOP_ARTISTS = 10
+TOP_OVERLAPS = 20
+
+def _ttl() -> int:
+    return getattr(settings, "SPOTIFY_STATS_CACHE_TTL", 60 * 60 * 24)
+
+def _month_label(ordinal: int) -> str:
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+def _aggregate(
+    track_count: int, total_ms: int, artist_counts: Counter, month_counts: Counter, artist_names: List[str]
+) -> Dict[str, Any]:
+    month_counts.pop(-1, None)
+    unique_artists = len(artist_counts)
+    return {
+        "track_count": track_count,
+        "total_duration_ms": total_ms,
+        "avg_duration_ms": round(total_ms / track_count) if track_count else 0,
+        "top_artists": [
+            {"name": artist_names[ref], "tracks": n} for ref, n in artist_counts.most_common(TOP_ARTISTS)
+        ],
+        "unique_artists": unique_artists,
+        "artist_diversity": round(unique_artists / track_count, 4) if track_count else 0.0,
+        "added_at_histogram": [
+            {"month": _month_label(m), "count": month_counts[m]} for m in sorted(month_counts)
+        ],
+    }
+
+def columns_stats(cols: TrackColumns) -> Dict[str, Any]:
+    """
+    Aggregates over one TrackColumns. Counter/sum run over the arrays directly.
+    """
+    return _aggregate(
+        len(cols),
+        sum(cols.durations),
+        Counter(cols.artist_refs),
+        Counter(cols.added_months),
+        cols.artist_names,
+    )
+
+def playlist_stats(user, pid: str) -> Dict[str, Any]:
+    pinfo = playlist_info(user, pid)
+    snapshot = pinfo.get("snapshot_id")
+    key = f"stats:playlist:{track_scope(user, pinfo)}:{pid}:{snapshot}"
+
+    stats = cache.get(key) if snapshot else None
+    if stats is None:
+        stats = columns_stats(playlist_columns(user, pid, pinfo))
+        if snapshot:
+            cache.set(key, stats, timeout=_ttl())
+    return {"id": pid, "name": pinfo.get("name"), "snapshot_id": snapshot, **stats}
+
+def library_stats(user) -> Dict[str, Any]:
+    summaries = summarize_user_playlists(user)
+    fingerprint = hashlib.sha1(
+        "|".join(f"{s['id']}:{s.get('snapshot_id')}" for s in summaries).encode()
+    ).hexdigest()
+    key = f"stats:library:{user.spotify_id}:{fingerprint}"
+
+    stats = cache.get(key)
+    if stats is None:
+        stats = _library_stats(user, summaries)
+        cache.set(key, stats, timeout=_ttl())
+    return stats
+
+def _playlist_pieces(user, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The per-snapshot parts library stats combine, cached like playlist_stats so a
+    library recompute only fetches playlists whose snapshot changed.
+    Artists are keyed by artist id, since refs are local to each TrackColumns.
+    """
+    pid, snapshot = summary["id"], summary.get("snapshot_id")
+    key = f"stats:pieces:{track_scope(user, summary)}:{pid}:{snapshot}"
+    pieces = cache.get(key) if snapshot else None
+    if pieces is not None:
+        return pieces
+
+    cols = playlist_columns(user, pid, summary)
+    artists: Counter = Counter()
+    artist_names: Dict[str, str] = {}
+    for ref, n in Counter(cols.artist_refs).items():
+        aid = cols.artist_ids[ref]
+        artists[aid] += n
+        artist_names.setdefault(aid, cols.artist_names[ref])
+    pieces = {
+        "track_count": len(cols),
+        "total_ms": sum(cols.durations),
+        "months": Counter(cols.added_months),
+        "artists": artists,
+        "artist_names": artist_names,
+        "track_ids": frozenset(tid for tid in cols.ids if tid),
+    }
+    if snapshot:
+        cache.set(key, pieces, timeout=_ttl())
+    return pieces
+
+def _library_stats(user, summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    artist_counts: Counter = Counter()
+    artist_names: Dict[str, str] = {}
+    month_counts: Counter = Counter()
+    track_count = 0
+    total_ms = 0
+    containing: Dict[str, List[int]] = defaultdict(list)
+    sizes: List[int] = []
+
+    for idx, s in enumerate(summaries):
+        pieces = _playlist_pieces(user, s)
+        track_count += pieces["track_count"]
+        total_ms += pieces["total_ms"]
+        month_counts.update(pieces["months"])
+        artist_counts.update(pieces["artists"])
+        for aid, name in pieces["artist_names"].items():
+            artist_names.setdefault(aid, name)
+        sizes.append(len(pieces["track_ids"]))
+        for tid in pieces["track_ids"]:
+            containing[tid].append(idx)
+
+    # Pair counts via the inverted index: cost is sum(k^2) over tracks in k playlists.
+    shared: Counter = Counter()
+    for idxs in containing.values():
+        if len(idxs) > 1:
+            shared.update(combinations(idxs, 2))
+
+    overlaps = []
+    for (a, b), n in shared.most_common(TOP_OVERLAPS):
+        union = sizes[a] + sizes[b] - n
+        overlaps.append({
+            "playlists": [summaries[a]["id"], summaries[b]["id"]],
+            "names": [summaries[a]["name"], summaries[b]["name"]],
+            "shared_tracks": n,
+            "jaccard": round(n / union, 4) if union else 0.0,
+        })
+
+    ids = list(artist_counts)
+    refs = {aid: i for i, aid in enumerate(ids)}
+    stats = _aggregate(
+        track_count,
+        total_ms,
+        Counter({refs[aid]: n for aid, n in artist_counts.items()}),
+        month_counts,
+        [artist_names[aid] for aid in ids],
+    )
+    return {
+        "playlist_count": len(summaries),
+        "unique_tracks": len(containing),
+        **stats,
+        "overlaps": overlaps,
+    }
@@ -0,0 +1,231 @@
+# spotify/services/trackstore.py
+'''
+Columnar, array-backed store of a playlist's tracks, one per (playlist, snapshot_id).
+ - TrackColumns: parallel columns; artists and album images are dictionary-encoded.
+ - playlist_columns: Get (or fetch and build) the columns for a playlist's current snapshot.
+Sort-key indexes and search text are derived lazily on the columns, once per snapshot.
+Built columns are kept in a bounded in-process LRU. A snapshot never changes, so
+nothing needs invalidating.
+'''
+
+from __future__ import annotations
+
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from .coalesce import single_flight
+from .playlists import playlist_info, track_scope, iter_track_pages
+
+STORE_TRACK_FIELDS = "added_at,track(id,name,uri,duration_ms,artists(id,name),album(images(url)))"
+SORT_KEYS = ("position", "name", "artist", "duration", "added_at")
+FILTER_CACHE_SIZE = 16
+
+class TrackColumns:
+    """
+    Row i is one playlist entry (unavailable/removed tracks are skipped).
+    Artists of row i are artist_refs[artist_offsets[i]:artist_offsets[i + 1]],
+    each an index into artist_ids / artist_names.
+    image_refs[i] indexes into images (a tuple of album image URLs), -1 for none.
+    added_months[i] is year * 12 + month - 1 of added_at, -1 if unknown.
+    """
+
+    __slots__ = (
+        "snapshot_id", "ids", "names", "uris", "added_at",
+        "durations", "added_months",
+        "artist_offsets", "artist_refs", "artist_ids", "artist_names", "_artist_index",
+        "image_refs", "images", "_image_index",
+        "_sort_indexes", "_search_text", "_filters",
+    )
+
+    def __init__(self, snapshot_id: Optional[str] = None):
+        self.snapshot_id = snapshot_id
+        self.ids: List[Optional[str]] = []
+        self.names: List[str] = []
+        self.uris: List[Optional[str]] = []
+        self.added_at: List[Optional[str]] = []
+        self.durations = array("l")
+        self.added_months = array("l")
+        self.artist_offsets = array("l", [0])
+        self.artist_refs = array("l")
+        self.artist_ids: List[str] = []
+        self.artist_names: List[str] = []
+        self._artist_index: Dict[str, int] = {}
+        self.image_refs = array("l")
+        self.images: List[Tuple[str, ...]] = []
+        self._image_index: Dict[Tuple[str, ...], int] = {}
+        self._sort_indexes: Dict[Tuple[str, bool], array] = {}
+        self._search_text: Optional[List[str]] = None
+        self._filters: "OrderedDict[Tuple[str, bool, str], array]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        """
+        Append raw {added_at, track} items as returned by the Spotify API.
+        """
+        for item in items:
+            t = item.get("track")
+            if not t:
+                continue
+            self.ids.append(t.get("id"))
+            self.names.append(t.get("name") or "")
+            self.uris.append(t.get("uri"))
+            added = item.get("added_at")
+            self.added_at.append(added)
+            self.durations.append(int(t.get("duration_ms") or 0))
+            self.added_months.append(_month_ordinal(added))
+
+            for a in t.get("artists") or []:
+                name = a.get("name") or ""
+                key = a.get("id") or f"name:{name}"  # local files have no artist id
+                ref = self._artist_index.get(key)
+                if ref is None:
+                    ref = self._artist_index[key] = len(self.artist_ids)
+                    self.artist_ids.append(key)
+                    self.artist_names.append(name)
+                self.artist_refs.append(ref)
+            self.artist_offsets.append(len(self.artist_refs))
+
+            urls = tuple(img["url"] for img in (t.get("album") or {}).get("images") or [] if img.get("url"))
+            if urls:
+                ref = self._image_index.get(urls)
+                if ref is None:
+                    ref = self._image_index[urls] = len(self.images)
+                    self.images.append(urls)
+                self.image_refs.append(ref)
+            else:
+                self.image_refs.append(-1)
+
+    def artists_of(self, row: int) -> array:
+        return self.artist_refs[self.artist_offsets[row]:self.artist_offsets[row + 1]]
+
+    # ---- Derived indexes (built lazily, once per snapshot) -------------------
+
+    def sort_index(self, key: str, descending: bool = False) -> array:
+        """
+        Row numbers ordered by `key` (one of SORT_KEYS); ties keep playlist order either way.
+        """
+        index = self._sort_indexes.get((key, descending))
+        if index is None:
+            if key == "position":
+                rows = range(len(self))
+                index = array("l", reversed(rows) if descending else rows)
+            else:
+                index = array("l", sorted(range(len(self)), key=self._sort_key(key), reverse=descending))
+            self._sort_indexes[(key, descending)] = index
+        return index
+
+    def _sort_key(self, key: str):
+        if key == "name":
+            folded = [n.casefold() for n in self.names]
+            return folded.__getitem__
+        if key == "artist":
+            names = [n.casefold() for n in self.artist_names]
+            refs, offsets = self.artist_refs, self.artist_offsets
+            firsts = [
+                names[refs[offsets[i]]] if offsets[i] < offsets[i + 1] else ""
+                for i in range(len(self))
+            ]
+            folded = [n.casefold() for n in self.names]
+            return lambda i: (firsts[i], folded[i])
+        if key == "duration":
+            return self.durations.__getitem__
+        if key == "added_at":
+            added = self.added_at
+            return lambda i: added[i] or ""
+        raise ValueError(f"Unknown sort key: {key}")
+
+    def search_text(self) -> List[str]:
+        """
+        Case-folded "name artist artist ..." per row, for substring filtering.
+        """
+        if self._search_text is None:
+            self._search_text = [
+                " ".join([self.names[i], *(self.artist_names[r] for r in self.artists_of(i))]).casefold()
+                for i in range(len(self))
+            ]
+        return self._search_text
+
+    def filtered_index(self, key: str, q: str, descending: bool = False) -> array:
+        """
+        sort_index(key, descending) restricted to rows whose search text contains every word of q.
+        The last few filters are kept so paging through a result doesn't rescan.
+        """
+        words = q.casefold().split()
+        order = self.sort_index(key, descending)
+        if not words:
+            return order
+        fkey = (key, descending, " ".join(words))
+        rows = self._filters.get(fkey)
+        if rows is None:
+            texts = self.search_text()
+            rows = array("l", (i for i in order if all(w in texts[i] for w in words)))
+            self._filters[fkey] = rows
+            while len(self._filters) > FILTER_CACHE_SIZE:
+                self._filters.popitem(last=False)
+        return rows
+
+def _month_ordinal(added_at: Optional[str]) -> int:
+    # ISO-8601 "YYYY-MM-DDTHH:MM:SSZ"; slicing is much cheaper than parsing
+    try:
+        return int(added_at[:4]) * 12 + int(added_at[5:7]) - 1
+    except (TypeError, ValueError):
+        return -1
+
+# ---- Per-snapshot LRU -------------------------------------------------------
+
+_store: "OrderedDict[Tuple[str, str, str], TrackColumns]" = OrderedDict()
+_store_lock = threading.Lock()
+
+def _store_get(key) -> Optional[TrackColumns]:
+    with _store_lock:
+        cols = _store.get(key)
+        if cols is not None:
+            _store.move_to_end(key)
+        return cols
+
+def _store_put(key, cols: TrackColumns) -> None:
+    limit = max(1, getattr(settings, "SPOTIFY_TRACKSTORE_MAX_SNAPSHOTS", 64))
+    with _store_lock:
+        _store[key] = cols
+        _store.move_to_end(key)
+        while len(_store) > limit:
+            _store.popitem(last=False)
+
+def playlist_columns(
+    user, pid: str, pinfo: Optional[Dict[str, Any]] = None,
+    on_page: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> TrackColumns:
+    """
+    Columns for the playlist's current snapshot. pinfo (from playlist_info) may be
+    passed in when the caller already has it; it doubles as the access check.
+    An entry from summarize_user_playlists also qualifies: it carries id, public and
+    snapshot_id, and me/playlists only lists playlists the user can read.
+    on_page sees each raw page if this call is the one that fetches them (not on a
+    store hit or when joining another caller's fetch).
+    """
+    if pinfo is None:
+        pinfo = playlist_info(user, pid)
+    snapshot = pinfo.get("snapshot_id")
+    key = (track_scope(user, pinfo), pid, snapshot)
+
+    cols = _store_get(key)
+    if cols is not None:
+        return cols
+
+    def build() -> TrackColumns:
+        built = TrackColumns(snapshot)
+        for page in iter_track_pages(user, pid, STORE_TRACK_FIELDS):
+            if on_page is not None:
+                on_page(page)
+            built.extend(page)
+        if snapshot:
+            _store_put(key, built)
+        return built
+
+    return single_flight((*key, "playlist_columns"), build)
@@ -0,0 +1,30 @@
+# spotify/services/warm.py
+'''
+Short-lived cache of results produced ahead of time by the login warm-up job.
+ - put: store a warm result for SPOTIFY_PREFETCH_TTL seconds.
+ - take: read and drop a result that is only valid once (not keyed by snapshot).
+ - get: read a result that stays valid for its key (keyed by snapshot_id).
+'''
+
+from __future__ import annotations
+
+from typing import Any, Hashable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+def _key(parts: Tuple[Hashable, ...]) -> str:
+    return "warm:" + ":".join(str(p) for p in parts)
+
+def put(parts: Tuple[Hashable, ...], value: Any) -> None:
+    cache.set(_key(parts), value, timeout=getattr(settings, "SPOTIFY_PREFETCH_TTL", 120))
+
+def take(parts: Tuple[Hashable, ...]) -> Optional[Any]:
+    key = _key(parts)
+    value = cache.get(key)
+    if value is not None:
+        cache.delete(key)
+    return value
+
+def get(parts: Tuple[Hashable, ...]) -> Optional[Any]:
+    return cache.get(_key(parts))
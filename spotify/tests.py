@@ -1,3 +1,590 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import profiling, writebehind
+from .models import SpotifyUser
+from .services import coalesce, export, prefetch, trackstore
+from .services.tracks import lite_track
+from .utils import encrypt_token
+
+
+class _CountingEvent(threading.Event):
+    """
+    Event whose waiters announce themselves, so a test knows when they are parked.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = threading.Semaphore(0)
+
+    def wait(self, timeout=None):
+        self.waiters.release()
+        return super().wait(timeout)
+
+
+KEY = ("test", "single_flight")
+
+
+class FakeResponse:
+    def __init__(self, data=None, status=200, headers=None):
+        self._data = data or {}
+        self.status_code = status
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise AssertionError(f"unexpected HTTP {self.status_code}")
+
+
+class FakeSpotify:
+    """
+    Just enough of the Web API for one user's library: liked songs, playlists,
+    their headers and paged tracks. Every requested URL is kept in `calls`.
+    Track pages at or past `throttle_from` answer 429 with a long Retry-After.
+    Bearer tokens outside `valid_tokens` get 401; the token endpoint issues "fresh".
+    `delay(path, offset)` may return seconds to hold a page back.
+    """
+
+    def __init__(self, liked=()):
+        self.liked = list(liked)
+        self.playlists = {}
+        self.calls = []
+        self.refreshes = 0
+        self.valid_tokens = {"access", "fresh"}
+        self.throttle_from = None
+        self.delay = None
+
+    def add_playlist(self, pid, tracks, snapshot="s1", name="Mix", public=False):
+        self.playlists[pid] = {
+            "id": pid, "name": name, "images": [], "owner": {"display_name": "me"},
+            "public": public, "snapshot_id": snapshot, "tracks": list(tracks),
+        }
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.refreshes += 1
+        return FakeResponse({"access_token": "fresh", "expires_in": 3600})
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.calls.append(url)
+        parts = urlsplit(url)
+        path = parts.path.split("/v1/", 1)[1]
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        query.update(params or {})
+        if (headers or {}).get("Authorization", "").removeprefix("Bearer ") not in self.valid_tokens:
+            return FakeResponse(status=401)
+        if self.delay is not None and "offset" in query:
+            time.sleep(self.delay(path, int(query["offset"])))
+        if path == "me/tracks":
+            return FakeResponse(self._page(path, self.liked, query))
+        if path == "me/playlists":
+            listed = [{**pl, "tracks": {"total": len(pl["tracks"])}} for pl in self.playlists.values()]
+            return FakeResponse(self._page(path, listed, query))
+        pid = path.split("/")[1]
+        pl = self.playlists.get(pid)
+        if pl is None:
+            raise AssertionError(f"unexpected request: {url}")
+        if path == f"playlists/{pid}":
+            return FakeResponse({k: v for k, v in pl.items() if k != "tracks"})
+        if path == f"playlists/{pid}/tracks":
+            if self.throttle_from is not None and int(query["offset"]) >= self.throttle_from:
+                return FakeResponse(status=429, headers={"Retry-After": "3600"})
+            return FakeResponse(self._page(path, pl["tracks"], query))
+        raise AssertionError(f"unexpected request: {url}")
+
+    @staticmethod
+    def _page(path, items, query):
+        limit, offset = int(query["limit"]), int(query["offset"])
+        nxt = None
+        if offset + limit < len(items):
+            nxt = f"https://api.spotify.com/v1/{path}?limit={limit}&offset={offset + limit}"
+        return {"items": items[offset:offset + limit], "next": nxt, "total": len(items)}
+
+
+def make_track(i, name, duration, artist="Artist"):
+    return {
+        "added_at": f"2024-01-{i % 28 + 1:02d}T00:00:00Z",
+        "track": {
+            "id": f"t{i}", "name": name, "uri": f"spotify:track:t{i}", "duration_ms": duration,
+            "artists": [{"id": artist.lower(), "name": artist}], "album": {"images": []},
+        },
+    }
+
+
+class SpotifyTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        trackstore._store.clear()
+        self.user = SpotifyUser.objects.create(
+            spotify_id="alice",
+            refresh_token=encrypt_token("refresh"),
+            access_token=encrypt_token("access"),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        session = self.client.session
+        session["spotify_id"] = self.user.spotify_id
+        session.save()
+
+    def serve(self, spotify):
+        for name in ("get", "post"):
+            patcher = mock.patch(f"requests.{name}", getattr(spotify, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class SingleFlightTests(TestCase):
+    def run_concurrently(self, fn, followers=4):
+        """
+        Start a leader, then `followers` more callers while the leader is still running.
+        """
+        entered, release = threading.Event(), threading.Event()
+        waiting = _CountingEvent()
+        results, errors = [], []
+
+        def leader_fn():
+            entered.set()
+            release.wait(5)
+            return fn()
+
+        def call(f):
+            try:
+                results.append(coalesce.single_flight(KEY, f))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call, args=(leader_fn,))]
+        threads[0].start()
+        self.assertTrue(entered.wait(5))
+        coalesce._inflight[KEY].done = waiting  # the leader sets it when done
+        for _ in range(followers):
+            t = threading.Thread(target=call, args=(lambda: self.fail("follower ran fn"),))
+            t.start()
+            threads.append(t)
+        for _ in range(followers):
+            self.assertTrue(waiting.waiters.acquire(timeout=5))
+        release.set()
+        for t in threads:
+            t.join(5)
+        return results, errors
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            return {"value": 42}
+
+        results, errors = self.run_concurrently(fn)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_followers_reraise_leader_exception(self):
+        def fn():
+            raise ValueError("upstream failed")
+
+        results, errors = self.run_concurrently(fn)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(e is errors[0] for e in errors))
+        self.assertIsInstance(errors[0], ValueError)
+
+    @override_settings(SPOTIFY_COALESCE_SHARED=True)
+    def test_shared_mode_does_not_serve_later_callers(self):
+        cache.clear()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(coalesce.single_flight(KEY, fn), 1)
+        self.assertEqual(coalesce.single_flight(KEY, fn), 2)
+
+
+class PlaylistCursorTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.spotify = FakeSpotify()
+        self.spotify.add_playlist("p1", [
+            make_track(0, "Blue", 200),
+            make_track(1, "Red", 100),
+            make_track(2, "Blue Moon", 200),
+            make_track(3, "Green", 300),
+            make_track(4, "Blue Sky", 100),
+        ])
+        self.serve(self.spotify)
+
+    def collect(self, **params):
+        ids = []
+        r = self.client.get("/api/playlists/p1", {"limit": 2, **params})
+        while True:
+            self.assertEqual(r.status_code, 200)
+            tracks = r.json()["tracks"]
+            ids += [it["track"]["id"] for it in tracks["items"]]
+            if not tracks["next_cursor"]:
+                return ids, tracks["total"]
+            r = self.client.get("/api/playlists/p1", {"cursor": tracks["next_cursor"]})
+
+    def test_ascending_round_trip(self):
+        ids, total = self.collect(sort="duration", order="asc")
+        self.assertEqual(ids, ["t1", "t4", "t0", "t2", "t3"])
+        self.assertEqual(total, 5)
+
+    def test_descending_keeps_playlist_order_for_ties(self):
+        ids, _ = self.collect(sort="duration", order="desc")
+        self.assertEqual(ids, ["t3", "t0", "t2", "t1", "t4"])
+
+    def test_filter_round_trip(self):
+        ids, total = self.collect(sort="name", q="blue")
+        self.assertEqual(ids, ["t0", "t2", "t4"])
+        self.assertEqual(total, 3)
+
+    def test_stale_snapshot_is_409(self):
+        r = self.client.get("/api/playlists/p1", {"limit": 2})
+        cursor = r.json()["tracks"]["next_cursor"]
+        self.spotify.playlists["p1"]["snapshot_id"] = "s2"
+        r = self.client.get("/api/playlists/p1", {"cursor": cursor})
+        self.assertEqual(r.status_code, 409)
+
+    def test_malformed_cursor_is_400(self):
+        r = self.client.get("/api/playlists/p1", {"cursor": "not-a-cursor"})
+        self.assertEqual(r.status_code, 400)
+
+
+class DetailContinuationTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.spotify = FakeSpotify()
+        self.spotify.add_playlist("p1", [make_track(i, f"Song {i}", 1000) for i in range(150)])
+        self.serve(self.spotify)
+
+    def test_resume_after_rate_limit(self):
+        self.spotify.throttle_from = 100
+        r = self.client.get("/api/playlists/p1")
+        self.assertEqual(r.status_code, 200)
+        first = r.json()
+        self.assertEqual(len(first["tracks"]["items"]), 100)
+        self.assertIn("continuation", first)
+
+        self.spotify.throttle_from = None
+        r = self.client.get("/api/playlists/p1", {"continuation": first["continuation"]})
+        self.assertEqual(r.status_code, 200)
+        rest = r.json()
+        self.assertEqual(len(rest["tracks"]["items"]), 50)
+        self.assertNotIn("continuation", rest)
+
+    def test_stale_continuation_is_409(self):
+        self.spotify.throttle_from = 100
+        token = self.client.get("/api/playlists/p1").json()["continuation"]
+        self.spotify.playlists["p1"]["snapshot_id"] = "s2"
+        r = self.client.get("/api/playlists/p1", {"continuation": token})
+        self.assertEqual(r.status_code, 409)
+
+    def test_malformed_continuation_is_400(self):
+        r = self.client.get("/api/playlists/p1", {"continuation": "garbage"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_rate_limited_before_first_page_is_429(self):
+        self.spotify.throttle_from = 0
+        r = self.client.get("/api/playlists/p1")
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r["Retry-After"], "3600")
+
+
+class WriteBehindTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        # No background flusher: the test drives flush() itself.
+        patcher = mock.patch.object(writebehind, "_thread", object())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(writebehind._pending.clear)
+
+    def test_flush_keeps_newer_pending_value(self):
+        expires = timezone.now() + timedelta(hours=1)
+        writebehind.queue_token_update(self.user, "older", expires)
+
+        real_filter = SpotifyUser.objects.filter
+
+        def filter_then_update(*args, **kwargs):
+            # A newer value arrives while the batch is being written.
+            writebehind.queue_token_update(self.user, "newer", expires)
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(SpotifyUser.objects, "filter", side_effect=filter_then_update):
+            self.assertEqual(writebehind.flush(), 1)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.access_token, "older")
+        self.assertEqual(writebehind.pending_token(self.user), ("newer", expires))
+
+        self.assertEqual(writebehind.flush(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.access_token, "newer")
+        self.assertIsNone(writebehind.pending_token(self.user))
+
+
+class StreamedProfileTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.spotify = FakeSpotify(liked=[make_track(i, f"Liked {i}", 1000) for i in range(120)])
+        self.spotify.add_playlist("p1", [make_track(i, f"Song {i}", 1000) for i in range(250)])
+        self.serve(self.spotify)
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        session = self.client.session
+        session["spotify_id"] = self.user.spotify_id
+        session.save()
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.enterContext(override_settings(PROFILE_ENABLED=True, PROFILE_DIR=Path(profile_dir.name)))
+
+    def test_export_capture_covers_the_whole_stream(self):
+        r = self.client.get("/api/export", HTTP_X_PROFILE="1")
+        name = r["X-Profile-Capture"]
+        self.assertIsNone(profiling.load_capture(name))  # written when the stream ends
+        b"".join(r.streaming_content)
+
+        capture = profiling.load_capture(name)
+        self.assertTrue(capture["streamed"])
+        self.assertEqual(len(capture["upstream"]), len(self.spotify.calls))
+        self.assertIn("export.py", capture["profile"])
+
+
+class WarmDetailTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.spotify = FakeSpotify()
+        self.spotify.add_playlist("p1", [
+            make_track(0, "First", 1000),
+            {"added_at": "2024-01-02T00:00:00Z", "track": None},
+            make_track(2, None, 1000),
+        ])
+        self.serve(self.spotify)
+
+    def detail(self):
+        items = self.client.get("/api/playlists/p1").json()["tracks"]["items"]
+        return [it["track"] and (it["track"]["id"], it["track"]["name"]) for it in items]
+
+    def test_warm_and_cold_detail_match(self):
+        cold = self.detail()
+        self.assertEqual(cold, [("t0", "First"), None, ("t2", None)])
+
+        cache.clear()
+        trackstore._store.clear()
+        prefetch.warm_library(self.user)
+        walks = [u for u in self.spotify.calls if "playlists/p1/tracks" in u]
+        self.assertEqual(len(walks), 2)  # the cold request, then one for the warm-up
+
+        self.assertEqual(self.detail(), cold)
+        self.assertEqual(len([u for u in self.spotify.calls if "playlists/p1/tracks" in u]), 2)
+
+
+class ExportTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.liked = [make_track(i, f"Liked {i}", 1000 + i) for i in range(120)]
+        self.mix = [make_track(i, f"Song {i}", 2000 + i, artist="Band") for i in range(250)]
+        self.mix[7] = {"added_at": "2024-01-08T00:00:00Z", "track": None}
+        self.spotify = FakeSpotify(liked=self.liked)
+        self.spotify.add_playlist("p1", self.mix, name="My Mix")
+        self.spotify.add_playlist("p2", [make_track(0, "Solo", 500)], name="A/B")
+        self.serve(self.spotify)
+
+    def archive(self, fmt):
+        r = self.client.get("/api/export", {"format": fmt})
+        self.assertEqual(r.status_code, 200)
+        return zipfile.ZipFile(io.BytesIO(b"".join(r.streaming_content)))
+
+    def ndjson(self, zf, name):
+        return [json.loads(line) for line in zf.read(name).decode().splitlines()]
+
+    def test_ndjson_members_and_rows(self):
+        zf = self.archive("ndjson")
+        self.assertEqual(zf.namelist(), [
+            "liked_songs.ndjson", "playlists/My Mix-p1.ndjson", "playlists/A_B-p2.ndjson",
+        ])
+        self.assertEqual(self.ndjson(zf, "liked_songs.ndjson"), [lite_track(it) for it in self.liked])
+        mix = self.ndjson(zf, "playlists/My Mix-p1.ndjson")
+        self.assertEqual(mix, [lite_track(it) for it in self.mix if it["track"]])  # null tracks skipped
+
+    def test_csv_rows(self):
+        zf = self.archive("csv")
+        rows = list(csv.reader(io.StringIO(zf.read("playlists/A_B-p2.csv").decode())))
+        self.assertEqual(rows[0], export.CSV_COLUMNS)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row["id"], "t0")
+        self.assertEqual(row["name"], "Solo")
+        self.assertEqual(row["artists"], "Artist")
+        self.assertEqual(row["duration_ms"], "500")
+        self.assertEqual(len(rows), 2)
+
+    @override_settings(SPOTIFY_EXPORT_PREFETCH=3)
+    def test_page_order_survives_out_of_order_prefetch(self):
+        # Earlier pages answer last, so completion order is the reverse of page order.
+        self.spotify.delay = lambda path, offset: 0.05 / (1 + offset // 50)
+        zf = self.archive("ndjson")
+        liked = [row["id"] for row in self.ndjson(zf, "liked_songs.ndjson")]
+        self.assertEqual(liked, [it["track"]["id"] for it in self.liked])
+        mix = [row["id"] for row in self.ndjson(zf, "playlists/My Mix-p1.ndjson")]
+        self.assertEqual(mix, [it["track"]["id"] for it in self.mix if it["track"]])
+
+    def test_expired_token_is_refreshed_and_pages_retried(self):
+        self.spotify.valid_tokens = {"fresh"}
+        zf = self.archive("ndjson")
+        self.assertGreaterEqual(self.spotify.refreshes, 1)
+        self.assertEqual(len(self.ndjson(zf, "liked_songs.ndjson")), 120)
+        self.assertEqual(len(self.ndjson(zf, "playlists/My Mix-p1.ndjson")), 249)
+
+
+class StatsTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.spotify = FakeSpotify()
+        self.spotify.add_playlist("p1", [
+            make_track(0, "a", 100, "A"), make_track(1, "b", 200, "A"), make_track(2, "c", 300, "B"),
+        ], name="One")
+        self.spotify.add_playlist("p2", [
+            make_track(1, "b", 200, "A"), make_track(2, "c", 300, "B"), make_track(3, "d", 400, "C"),
+        ], name="Two")
+        self.spotify.add_playlist("p3", [make_track(9, "z", 1000, "C")], name="Three")
+        self.serve(self.spotify)
+
+    def track_walks(self):
+        return sorted(u.split("/")[5] for u in self.spotify.calls if "/tracks" in u and "me/" not in u)
+
+    def test_playlist_stats(self):
+        stats = self.client.get("/api/playlists/p1/stats").json()
+        self.assertEqual(stats["track_count"], 3)
+        self.assertEqual(stats["total_duration_ms"], 600)
+        self.assertEqual(stats["avg_duration_ms"], 200)
+        self.assertEqual(stats["top_artists"], [{"name": "A", "tracks": 2}, {"name": "B", "tracks": 1}])
+        self.assertEqual(stats["artist_diversity"], round(2 / 3, 4))
+        self.assertEqual(stats["added_at_histogram"], [{"month": "2024-01", "count": 3}])
+
+    def test_library_stats(self):
+        stats = self.client.get("/api/playlists/stats").json()
+        self.assertEqual(stats["playlist_count"], 3)
+        self.assertEqual(stats["track_count"], 7)
+        self.assertEqual(stats["unique_tracks"], 5)
+        self.assertEqual(stats["total_duration_ms"], 2500)
+        self.assertEqual(stats["avg_duration_ms"], 357)
+        self.assertEqual(stats["top_artists"], [
+            {"name": "A", "tracks": 3}, {"name": "B", "tracks": 2}, {"name": "C", "tracks": 2},
+        ])
+        self.assertEqual(stats["unique_artists"], 3)
+        self.assertEqual(stats["artist_diversity"], round(3 / 7, 4))
+        self.assertEqual(stats["overlaps"], [{
+            "playlists": ["p1", "p2"], "names": ["One", "Two"], "shared_tracks": 2, "jaccard": 0.5,
+        }])
+
+    def test_changed_snapshot_refetches_only_that_playlist(self):
+        self.client.get("/api/playlists/stats")
+        self.assertEqual(self.track_walks(), ["p1", "p2", "p3"])
+
+        self.spotify.calls.clear()
+        trackstore._store.clear()  # only the cached pieces may save the other walks
+        self.spotify.add_playlist("p2", [
+            make_track(0, "a", 100, "A"), make_track(1, "b", 200, "A"), make_track(2, "c", 300, "B"),
+        ], snapshot="s2", name="Two")
+        stats = self.client.get("/api/playlists/stats").json()
+
+        self.assertEqual(self.track_walks(), ["p2"])
+        self.assertEqual(stats["overlaps"][0]["shared_tracks"], 3)
+        self.assertEqual(stats["overlaps"][0]["jaccard"], 1.0)
+
+
+def decode_columnar(body):
+    """
+    Columnar response back to (id, name, artists, duration_ms, added_at, image urls) rows.
+    """
+    t, d = body["tracks"], body["dictionaries"]
+    offsets = t["artist_offsets"]
+    assert len(offsets) == len(t["ids"]) + 1, "artist_offsets needs one entry per row plus one"
+    return [
+        (
+            t["ids"][i],
+            t["names"][i],
+            [d["artists"][r] for r in t["artist_refs"][offsets[i]:offsets[i + 1]]],
+            t["duration_ms"][i],
+            t["added_at"][i],
+            d["images"][t["image"][i]] if t["image"][i] >= 0 else None,
+        )
+        for i in range(len(t["ids"]))
+    ]
+
+
+def as_row(item):
+    t = item["track"]
+    urls = [img["url"] for img in t["album"]["images"]]
+    return (
+        t["id"], t["name"], [a["name"] for a in t["artists"]], t["duration_ms"],
+        item.get("added_at"), urls or None,
+    )
+
+
+class ColumnarTests(SpotifyTestCase):
+    def setUp(self):
+        super().setUp()
+
+        def item(i, name, artists, images):
+            entry = make_track(i, name, 1000 * (i + 1))
+            entry["track"]["artists"] = [{"id": a.lower(), "name": a} for a in artists]
+            entry["track"]["album"] = {"images": [{"url": u} for u in images]}
+            return entry
+
+        self.items = [
+            item(0, "Delta", ["A", "B"], ["img1", "img1-small"]),
+            {"added_at": "2024-01-02T00:00:00Z", "track": None},
+            item(2, "Alpha", ["C"], []),
+            item(3, "Charlie", [], ["img2"]),
+            item(4, "Bravo", ["B", "A"], ["img1", "img1-small"]),
+        ]
+        self.spotify = FakeSpotify()
+        self.spotify.add_playlist("p1", self.items)
+        self.serve(self.spotify)
+
+    def test_full_columnar_decodes_to_rows(self):
+        body = self.client.get("/api/playlists/p1", {"format": "columnar"}).json()
+        self.assertEqual(decode_columnar(body), [as_row(it) for it in self.items if it["track"]])
+        self.assertEqual(body["tracks"]["image"], [0, -1, 1, 0])
+        self.assertEqual(body["dictionaries"]["artists"], ["A", "B", "C"])
+        # Null tracks are left out of the store-backed formats, unlike the plain detail.
+        self.assertEqual(body["tracks"]["total"], 4)
+        plain = self.client.get("/api/playlists/p1").json()
+        self.assertEqual(len(plain["tracks"]["items"]), 5)
+
+    def test_page_columnar_matches_rows_format_with_local_tables(self):
+        params = {"sort": "name", "limit": 2}
+        cursors = {"rows": None, "columnar": None}
+        for _ in range(2):
+            pages = {}
+            for fmt in ("rows", "columnar"):
+                query = {"cursor": cursors[fmt]} if cursors[fmt] else params
+                pages[fmt] = self.client.get("/api/playlists/p1", {**query, "format": fmt}).json()
+                cursors[fmt] = pages[fmt]["tracks"]["next_cursor"]
+            rows = [as_row(it) for it in pages["rows"]["tracks"]["items"]]
+            self.assertEqual(decode_columnar(pages["columnar"]), rows)
+
+        # Second page is Charlie, Delta: only the artists/images it uses, renumbered from 0.
+        self.assertEqual(pages["columnar"]["dictionaries"]["artists"], ["A", "B"])
+        self.assertEqual(pages["columnar"]["dictionaries"]["images"], [["img2"], ["img1", "img1-small"]])
+        self.assertEqual(pages["columnar"]["tracks"]["artist_offsets"], [0, 0, 2])
+        self.assertEqual(pages["columnar"]["tracks"]["image"], [0, 1])
@@ -1,6 +1,6 @@
 # spotify/urls.py
 from django.urls import path
-from .views import auth, session, playlists, root, tracks
+from .views import auth, session, playlists, root, tracks, profiling, export
 
 urlpatterns = [
     # Root + health
@@ -17,8 +17,17 @@ urlpatterns = [
     # Playlists
     path("api/playlists", playlists.get_playlists),
     path("api/playlists/summary", playlists.get_playlists_summary),
+    path("api/playlists/stats", playlists.get_library_stats),
     path("api/playlists/<str:pid>", playlists.get_playlist_detail),
+    path("api/playlists/<str:pid>/stats", playlists.get_playlist_stats),
 
     # Liked tracks (for the queue panel data source)
     path("api/spotify/liked-tracks", tracks.liked_tracks),
+
+    # Full-library export (streamed zip)
+    path("api/export", export.export_library),
+
+    # Profiling captures (staff only)
+    path("api/admin/profiles", profiling.list_captures),
+    path("api/admin/profiles/<str:name>", profiling.capture_detail),
 ]
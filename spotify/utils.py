@@ -2,10 +2,11 @@
 from cryptography.fernet import Fernet
 import os
 import base64
-import requests
 from django.utils import timezone
 from datetime import timedelta
 from .models import SpotifyUser
+from .clients.spotify import sp_post_form
+from . import writebehind
 
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
@@ -22,9 +23,15 @@ def set_access_token(user: SpotifyUser, token: str, expires_in: int):
     user.access_token = encrypt_token(token)
     skew = 60
     user.expires_at = timezone.now() + timedelta(seconds=max(0, expires_in - skew))
-    user.save(update_fields=["access_token", "expires_at"])
+    if writebehind.enabled():
+        writebehind.queue_token_update(user, user.access_token, user.expires_at)
+    else:
+        user.save(update_fields=["access_token", "expires_at", "updated_at"])
 
 def get_stored_access_token(user: SpotifyUser) -> str | None:
+    pending = writebehind.pending_token(user) if writebehind.enabled() else None
+    if pending:
+        user.access_token, user.expires_at = pending
     if user.access_token and user.expires_at and user.expires_at > timezone.now():
         return decrypt_token(user.access_token)
     return None
@@ -36,7 +43,7 @@ def refresh_access_token(user: SpotifyUser) -> str:
     payload = {"grant_type": "refresh_token", "refresh_token": decrypt_token(user.refresh_token)}
     headers = {"Authorization": f"Basic {auth_header}", "Content-Type": "application/x-www-form-urlencoded"}
 
-    r = requests.post(token_url, data=payload, headers=headers)
+    r = sp_post_form(token_url, data=payload, headers=headers)
     if r.status_code != 200:
         raise Exception(f"Failed to refresh token: {r.text}")
 
@@ -45,8 +52,10 @@ def refresh_access_token(user: SpotifyUser) -> str:
     expires_in = token_data.get("expires_in", 3600)
 
     # Spotify may rotate the refresh token; persist if present
+    # (written synchronously: losing a rotated refresh token would log the user out)
     if "refresh_token" in token_data and token_data["refresh_token"]:
         user.refresh_token = encrypt_token(token_data["refresh_token"])
+        user.save(update_fields=["refresh_token", "updated_at"])
 
     set_access_token(user, new_access_token, expires_in)
     return new_access_token
@@ -6,11 +6,13 @@ This module handles the authentication flow for Spotify integration.
  - Exchanges the authorization code for access and refresh tokens.
  - Fetches the user's Spotify profile and upserts it into the database.
  - Provides CSRF-safe OAuth state generation and validation.
+ - Queues a background library warm-up so the first screen after login is served warm.
 '''
 
 import os, urllib.parse
 from django.http import HttpResponseBadRequest, HttpResponseRedirect
 from ..services import auth as svc
+from ..services import prefetch
 
 SCOPES = [
     "user-read-private","user-read-email",
@@ -46,6 +48,7 @@ def auth_callback(request):
 
     request.session["spotify_id"] = user.spotify_id
     request.session.set_expiry(60 * 60 * 24 * 7)
+    prefetch.enqueue_warmup(user)
 
     frontend = os.getenv("FRONTEND_APP_URL") or "http://localhost:5173"
     return HttpResponseRedirect(frontend)
@@ -0,0 +1,32 @@
+# spotify/views/export.py
+'''
+This module handles the library export view for the Spotify app.
+- Streams a zip of NDJSON or CSV files (liked songs + one file per playlist).
+'''
+
+from django.http import StreamingHttpResponse, HttpResponseForbidden, HttpResponseBadRequest
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from ..models import SpotifyUser
+from ..services import export as svc
+
+def _require_user(request):
+    sid = request.session.get("spotify_id")
+    if not sid:
+        return None
+    return SpotifyUser.objects.get(spotify_id=sid)
+
+@require_GET
+def export_library(request):
+    user = _require_user(request)
+    if not user:
+        return HttpResponseForbidden("Not authenticated")
+
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in svc.FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(svc.FORMATS)}")
+
+    filename = f"spotify-library-{timezone.now():%Y%m%d}.zip"
+    response = StreamingHttpResponse(svc.export_library_zip(user, fmt), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -2,12 +2,27 @@
 '''
 This module handles playlist-related views for the Spotify app.
 - Provides endpoints to get user playlists, a summary of playlists, and details of a specific playlist.
+- Summary and full detail run within SPOTIFY_REQUEST_BUDGET; if it runs out they return
+  what was fetched plus a "continuation" token to pass back as ?continuation=.
+  If Spotify rate-limits before anything was fetched, they return 429 with Retry-After.
+- Playlist detail is served sorted/filtered/paginated when any of PAGE_PARAMS is given,
+  and in the compact columnar format with ?format=columnar. Those responses skip
+  unavailable (null) tracks; the plain detail response keeps them.
+- Provides analytics endpoints for a single playlist and for the whole library.
 '''
 
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
 from django.views.decorators.http import require_GET
 from ..models import SpotifyUser
 from ..services import playlists as svc
+from ..services import stats as stats_svc
+from ..services import playlist_pages as pages_svc
+from ..services.deadline import (
+    Deadline, InvalidContinuation, StaleContinuation, RateLimited, make_continuation, read_continuation,
+)
+
+PAGE_PARAMS = ("sort", "order", "q", "limit", "cursor")
+COMPACT_JSON = {"separators": (",", ":")}
 
 def _require_user(request):
     sid = request.session.get("spotify_id")
@@ -33,8 +48,23 @@ def get_playlists_summary(request):
     if not user:
         return HttpResponseForbidden("Not authenticated")
 
-    data = svc.summarize_user_playlists(user)
-    return JsonResponse({"items": data}, safe=False)
+    try:
+        state = read_continuation(request.GET.get("continuation"))
+        if state and state.get("k") != "summary":
+            raise InvalidContinuation("Continuation belongs to another endpoint")
+    except InvalidContinuation as e:
+        return HttpResponseBadRequest(str(e))
+
+    try:
+        data = svc.summarize_user_playlists_partial(
+            user, deadline=Deadline.for_request(), offset=state.get("o", 0)
+        )
+    except RateLimited as e:
+        return _rate_limited(e)
+    body = {"items": data["items"]}
+    if data["next_offset"] is not None:
+        body["continuation"] = make_continuation(k="summary", o=data["next_offset"])
+    return JsonResponse(body, safe=False)
 
 @require_GET
 def get_playlist_detail(request, pid):
@@ -42,5 +72,77 @@ def get_playlist_detail(request, pid):
     if not user:
         return HttpResponseForbidden("Not authenticated")
 
-    data = svc.playlist_detail(user, pid)
+    fmt = request.GET.get("format", "rows")
+    if fmt not in pages_svc.FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(pages_svc.FORMATS)}")
+    json_params = COMPACT_JSON if fmt == "columnar" else None
+
+    if not any(p in request.GET for p in PAGE_PARAMS):
+        if fmt == "columnar":
+            return JsonResponse(pages_svc.playlist_columnar(user, pid), json_dumps_params=json_params)
+        return _budgeted_detail(request, user, pid)
+
+    sort  = request.GET.get("sort", "position")
+    order = request.GET.get("order", "asc")
+    if sort not in pages_svc.SORT_KEYS:
+        return HttpResponseBadRequest(f"sort must be one of: {', '.join(pages_svc.SORT_KEYS)}")
+    if order not in pages_svc.ORDERS:
+        return HttpResponseBadRequest(f"order must be one of: {', '.join(pages_svc.ORDERS)}")
+    try:
+        limit = int(request.GET["limit"]) if "limit" in request.GET else None
+    except ValueError:
+        return HttpResponseBadRequest("limit must be an integer")
+
+    try:
+        data = pages_svc.playlist_page(
+            user, pid, sort=sort, order=order, q=request.GET.get("q", ""),
+            limit=limit, cursor=request.GET.get("cursor"), fmt=fmt,
+        )
+    except pages_svc.InvalidCursor as e:
+        return HttpResponseBadRequest(str(e))
+    except pages_svc.StaleCursor as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    return JsonResponse(data, json_dumps_params=json_params)
+
+def _rate_limited(e: RateLimited):
+    response = JsonResponse({"error": str(e), "retry_after": e.retry_after}, status=429)
+    response["Retry-After"] = str(e.retry_after)
+    return response
+
+def _budgeted_detail(request, user, pid):
+    try:
+        state = read_continuation(request.GET.get("continuation"))
+        if state and state.get("p") != pid:
+            raise InvalidContinuation("Continuation belongs to another playlist")
+        data = svc.playlist_detail_partial(
+            user, pid, deadline=Deadline.for_request(),
+            offset=state.get("o", 0), snapshot_id=state.get("s"),
+        )
+    except InvalidContinuation as e:
+        return HttpResponseBadRequest(str(e))
+    except StaleContinuation as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    except RateLimited as e:
+        return _rate_limited(e)
+
+    snapshot = data.pop("snapshot_id")
+    next_offset = data.pop("next_offset")
+    if next_offset is not None:
+        data["continuation"] = make_continuation(p=pid, s=snapshot, o=next_offset)
     return JsonResponse(data, safe=False)
+
+@require_GET
+def get_playlist_stats(request, pid):
+    user = _require_user(request)
+    if not user:
+        return HttpResponseForbidden("Not authenticated")
+
+    return JsonResponse(stats_svc.playlist_stats(user, pid))
+
+@require_GET
+def get_library_stats(request):
+    user = _require_user(request)
+    if not user:
+        return HttpResponseForbidden("Not authenticated")
+
+    return JsonResponse(stats_svc.library_stats(user))
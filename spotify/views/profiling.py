@@ -0,0 +1,23 @@
+# spotify/views/profiling.py
+'''
+This module provides staff-only views over stored profiling captures.
+- Lists recent captures (newest first) and returns a single capture in full.
+'''
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, Http404
+from django.views.decorators.http import require_GET
+from .. import profiling
+
+@require_GET
+@staff_member_required
+def list_captures(request):
+    return JsonResponse({"items": profiling.list_captures()})
+
+@require_GET
+@staff_member_required
+def capture_detail(request, name):
+    report = profiling.load_capture(name)
+    if report is None:
+        raise Http404("No such capture")
+    return JsonResponse(report)
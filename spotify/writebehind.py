@@ -0,0 +1,94 @@
+# spotify/writebehind.py
+'''
+Write-behind batching for SpotifyUser token updates.
+ - queue_token_update: Record a new (encrypted) access token + expiry for a user.
+ - pending_token: The newest queued value for a user, so this process reads its own writes.
+ - flush: Apply everything queued in one transaction (also run by a background thread).
+ - flush_stats: Counters (updates queued, flushes run, rows written, background flushes failed) for this process.
+Repeated updates to the same user collapse into one row write. A lost update only
+costs one extra token refresh, so these writes don't need to be synchronous.
+'''
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SpotifyUser
+
+logger = logging.getLogger(__name__)
+
+_pending: Dict[int, Tuple[str, datetime]] = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_stats = {"queued": 0, "flushes": 0, "rows": 0, "failed": 0}
+_thread: Optional[threading.Thread] = None
+
+def enabled() -> bool:
+    return getattr(settings, "SPOTIFY_DB_WRITE_BEHIND", False)
+
+def queue_token_update(user: SpotifyUser, access_token: str, expires_at: datetime) -> None:
+    """
+    access_token must already be encrypted.
+    """
+    global _thread
+    with _lock:
+        _pending[user.pk] = (access_token, expires_at)
+        _stats["queued"] += 1
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="token-write-behind", daemon=True)
+            _thread.start()
+            atexit.register(flush)
+
+def pending_token(user: SpotifyUser) -> Optional[Tuple[str, datetime]]:
+    with _lock:
+        return _pending.get(user.pk)
+
+def flush_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+def flush() -> int:
+    """
+    Write all queued updates; returns how many rows were written.
+    """
+    with _flush_lock:
+        with _lock:
+            batch = dict(_pending)
+        if not batch:
+            return 0
+
+        now = timezone.now()
+        with transaction.atomic():
+            for pk, (access_token, expires_at) in batch.items():
+                SpotifyUser.objects.filter(pk=pk).update(
+                    access_token=access_token, expires_at=expires_at, updated_at=now
+                )
+
+        with _lock:
+            for pk, value in batch.items():
+                if _pending.get(pk) == value:  # keep anything newer that arrived meanwhile
+                    del _pending[pk]
+            _stats["flushes"] += 1
+            _stats["rows"] += len(batch)
+        return len(batch)
+
+def _run() -> None:
+    interval = max(0.01, getattr(settings, "SPOTIFY_DB_FLUSH_INTERVAL", 0.5))
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            with _lock:
+                _stats["failed"] += 1
+            logger.exception("Token write-behind flush failed; will retry")